@@ -1,20 +1,112 @@
+import math
 import time
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from environment import Card, BlackjackEnvironment
+from typing import List, Optional, Sequence, Tuple, Union
+from environment import Card, BlackjackEnvironment, check_count_system
+from history import BankrollHistory, make_history
+from rules import DEFAULT_RULES, TableRules
+from strategy_tables import strategy_tables
 from ui import ConsoleUI
-from utils import Action, hand_value, recommend_action
+from utils import DEFAULT_TABLES, Action, Hand, StrategyTables, recommend_action
+
+
+class BetRamp:
+    """
+    Counting bet ramp: a bet multiplier by true count, from bands of
+    (low, high, multiplier) that apply when low <= true count < high, and
+    default outside every band. Below drawdown_bankroll (if set) the
+    multiplier is divided by drawdown_divisor, but never below 1.
+    """
+    __slots__ = ('bands', 'default', 'drawdown_bankroll', 'drawdown_divisor')
+
+    def __init__(self, bands: Sequence[Tuple[float, float, int]], default: int,
+                 drawdown_bankroll: Optional[float] = None, drawdown_divisor: int = 2) -> None:
+        self.bands = tuple((float(low), float(high), int(multiplier)) for low, high, multiplier in bands)
+        self.default = int(default)
+        self.drawdown_bankroll = drawdown_bankroll
+        self.drawdown_divisor = int(drawdown_divisor)
+
+    @classmethod
+    def from_thresholds(cls, thresholds: Sequence[float], multipliers: Sequence[int],
+                        drawdown_bankroll: Optional[float] = None, drawdown_divisor: int = 2) -> "BetRamp":
+        """
+        Contiguous ramp: multipliers[0] below thresholds[0], multipliers[i]
+        from thresholds[i - 1] up to thresholds[i], and multipliers[-1] from
+        the last threshold on.
+        """
+        if len(multipliers) != len(thresholds) + 1:
+            raise ValueError("A ramp needs one more multiplier than thresholds")
+        edges = [-math.inf, *thresholds]
+        bands = [(low, high, multiplier) for low, high, multiplier in zip(edges, edges[1:], multipliers)]
+        return cls(bands, multipliers[-1], drawdown_bankroll, drawdown_divisor)
+
+    def multiplier(self, true_count: float, bankroll: float) -> int:
+        multiplier = self.default
+        for low, high, band_multiplier in self.bands:
+            if low <= true_count < high:
+                multiplier = band_multiplier
+                break
+        if self.drawdown_bankroll is not None and bankroll < self.drawdown_bankroll:
+            multiplier = max(1, multiplier // self.drawdown_divisor)
+        return max(multiplier, 1)
+
+    def multipliers(self, true_counts, bankrolls):
+        """multiplier over NumPy arrays of true counts and bankrolls (broadcast together)."""
+        import numpy as np
+        true_counts = np.asarray(true_counts)
+        multipliers = np.full(true_counts.shape, self.default, dtype=np.int64)
+        # Earlier bands win, as in multiplier
+        for low, high, band_multiplier in reversed(self.bands):
+            multipliers[(true_counts >= low) & (true_counts < high)] = band_multiplier
+        if self.drawdown_bankroll is not None:
+            multipliers = np.where(np.asarray(bankrolls) < self.drawdown_bankroll,
+                                   np.maximum(1, multipliers // self.drawdown_divisor), multipliers)
+        return np.maximum(multipliers, 1)
+
+    def to_dict(self) -> dict:
+        return {'bands': [list(band) for band in self.bands], 'default': self.default,
+                'drawdown_bankroll': self.drawdown_bankroll, 'drawdown_divisor': self.drawdown_divisor}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "BetRamp":
+        return cls(state['bands'], state['default'], state['drawdown_bankroll'], state['drawdown_divisor'])
+
+    def __repr__(self) -> str:
+        bands = ", ".join(f"[{low:g}, {high:g}) {multiplier}x" for low, high, multiplier in self.bands)
+        drawdown = (f", /{self.drawdown_divisor} below {self.drawdown_bankroll:g}"
+                    if self.drawdown_bankroll is not None else "")
+        return f"BetRamp({bands}, else {self.default}x{drawdown})"
+
+
+# BlackjackAgent strategies. 'rank_groups' bets like 'counting' but plays the best action by
+# EV against the shares of four rank groups left in the shoe (ev.rank_group_action)
+STRATEGIES = ('unskilled', 'basic', 'counting', 'rank_groups')
+# Strategies that bet by the true count
+COUNTING_STRATEGIES = ('counting', 'rank_groups')
+
+# The long-standing counting ramp: 1x up to TC 1, 2x/3x/5x from TC 2/3/5, 7x from TC 7,
+# halved below a 5000 bankroll. True counts between 1 and 2 fall outside every band, to 7x.
+DEFAULT_BET_RAMP = BetRamp([(-math.inf, math.nextafter(1.0, math.inf), 1), (2, 3, 2), (3, 5, 3), (5, 7, 5)],
+                           default=7, drawdown_bankroll=5000)
 
 
 class Agent(ABC):
     _id_counter: int = 1
-    def __init__(self, bankroll: int = 2000, base_bet: int = 20) -> None:
+    # Counting system whose true count the agent bets and plays by (environment.COUNT_SYSTEMS)
+    count_system: str = 'hi_lo'
+    # Rules of the agent's table and the strategy tables for them (BlackjackGame sets both)
+    rules: TableRules = DEFAULT_RULES
+    tables: StrategyTables = DEFAULT_TABLES
+
+    def __init__(self, bankroll: int = 2000, base_bet: int = 20,
+                 history: Union[str, BankrollHistory] = 'array') -> None:
         self.id: int = Agent._id_counter
         Agent._id_counter += 1
         self.bankroll: int = bankroll
         self.base_bet: int = base_bet
-        self.hands: List[List[Card]] = []
-        self.hand_bets: List[int] = []
+        self.hands: List[Hand] = []
+        # Wager for the coming round; the opening hand is dealt with it
+        self.bet: int = 0
         self.broke_round: Optional[int] = None
         self.stats = {
             'wins': 0,
@@ -22,36 +114,62 @@ class Agent(ABC):
             'pushes': 0,
             'total_profit': 0,
             'rounds_played': 0,
-            'bankroll_history': []
+            # Bankroll before each round; history.py recorder, by mode or instance
+            'bankroll_history': make_history(history),
+            # Decision counters, read by game instrumentation
+            'recommend_calls': 0,
+            'splits': 0,
+            'doubles': 0
         }
 
     def adjust_bankroll(self, amount: float) -> None:
         self.bankroll += amount
 
     def clear_bets(self):
-        self.hand_bets = []
+        self.bet = 0
+        self.hands = []
+
+    def true_count(self, env: BlackjackEnvironment) -> float:
+        if self.count_system == 'hi_lo':
+            return env.true_count
+        return env.true_count_for(self.count_system)
+
+    def set_rules(self, rules: TableRules) -> None:
+        self.rules = rules
+        self.tables = strategy_tables(rules)
 
-    def can_split(self, hand: List[Card], hand_index: int) -> bool:
-        split_cost = self.hand_bets[hand_index] * 2
-        return (len(hand) == 2 and 
-                hand[0] == hand[1] and 
-                self.bankroll > split_cost)
+    def can_split(self, hand: Hand, hand_index: int) -> bool:
+        split_cost = hand.bet * 2
+        max_hands = self.rules.max_split_hands
+        return (hand.is_pair and self.bankroll > split_cost
+                and (max_hands is None or len(self.hands) < max_hands))
     
     def split_hand(self, hand_index: int, env: BlackjackEnvironment) -> None:
         original_hand = self.hands[hand_index]
         split_card = original_hand.pop()
-        new_hand = [split_card, env.deal()]
+        new_hand = Hand([split_card, env.deal()], bet=original_hand.bet)
         self.hands.append(new_hand)
         original_hand.append(env.deal())
-        self.hand_bets.append(self.hand_bets[hand_index])
+        self.stats['splits'] += 1
     
     def double_hand(self, hand_index: int, env: BlackjackEnvironment) -> None:
-        self.hand_bets[hand_index] *= 2
-        self.hands[hand_index].append(env.deal())
+        hand = self.hands[hand_index]
+        hand.bet *= 2
+        hand.doubled = True
+        hand.append(env.deal())
+        self.stats['doubles'] += 1
     
-    def can_double(self, hand: List[Card], hand_index: int) -> bool:
-        double_cost = self.hand_bets[hand_index] * 2  # Cost of doubling
-        return len(hand) == 2 and self.bankroll >= double_cost
+    def can_double(self, hand: Hand, hand_index: int) -> bool:
+        double_cost = hand.bet * 2  # Cost of doubling
+        return (len(hand) == 2 and self.bankroll >= double_cost
+                and (self.rules.double_after_split or len(self.hands) == 1))
+
+    def can_surrender(self, hand: Hand, hand_index: int) -> bool:
+        # Only the opening two cards, never after a split
+        return self.rules.surrender and len(self.hands) == 1 and len(hand) == 2
+
+    def surrender_hand(self, hand_index: int) -> None:
+        self.hands[hand_index].surrendered = True
     
     @abstractmethod
     def place_bet(self, true_count: float) -> int:
@@ -63,9 +181,22 @@ class Agent(ABC):
 
 
 class BlackjackAgent(Agent):
-    def __init__(self, bankroll: int = 10000, base_bet: int = 30, strategy: str = 'basic'):
-        super().__init__(bankroll, base_bet)
+    def __init__(self, bankroll: int = 10000, base_bet: int = 30, strategy: str = 'basic',
+                 count_system: str = 'hi_lo', bet_ramp: Optional[BetRamp] = None,
+                 history: Union[str, BankrollHistory] = 'array'):
+        super().__init__(bankroll, base_bet, history)
         self.strategy = strategy
+        check_count_system(count_system)
+        self.count_system = count_system
+        # Only the counting strategies vary their bet
+        self.bet_ramp = bet_ramp if bet_ramp is not None else DEFAULT_BET_RAMP
+
+    @property
+    def label(self) -> str:
+        """Strategy name for results; counting agents on other systems than Hi-Lo get it appended."""
+        if self.strategy in COUNTING_STRATEGIES and self.count_system != 'hi_lo':
+            return f"{self.strategy}:{self.count_system}"
+        return self.strategy
 
     def place_bet(self, true_count: float) -> int:
         """Places a bet based on the agent's strategy."""
@@ -73,22 +204,8 @@ class BlackjackAgent(Agent):
         if self.strategy in ["basic", "unskilled"]:
             bet = self.base_bet  # Always bet the base amount
 
-        elif self.strategy == "counting":
-            if true_count <= 1:
-                bet_multiplier = 1
-            elif 2 <= true_count < 3:
-                bet_multiplier = 2  # Only double bet at TC 2
-            elif 3 <= true_count < 5:
-                bet_multiplier = 3  # Slight increase
-            elif 5 <= true_count < 7:
-                bet_multiplier = 5  # Mid-range jump
-            else:
-                bet_multiplier = 7  # Cap at 7x instead of 10x for safety
-
-            if self.bankroll < 5000:  # If bankroll is below 50% of starting value
-                bet_multiplier = max(1, bet_multiplier // 2)  # Halve the bet multiplier
-
-            bet = self.base_bet * max(bet_multiplier, 1)
+        elif self.strategy in COUNTING_STRATEGIES:
+            bet = self.base_bet * self.bet_ramp.multiplier(true_count, self.bankroll)
 
         else:
             raise ValueError(f"Unknown strategy: {self.strategy}")
@@ -98,10 +215,17 @@ class BlackjackAgent(Agent):
         bet = max(bet, 0)
 
         # Track the bet
-        self.hand_bets.append(bet)
+        self.bet = int(bet)
 
         return int(bet)  # Ensure bet is an integer (casinos require whole numbers)
 
+    def recommend(self, hand: Hand, dealer_upcard: Card, env: BlackjackEnvironment, allow_split=True) -> Action:
+        """The strategy's action on hand, as a strategy-table entry."""
+        if self.strategy == 'rank_groups':
+            from ev import rank_group_action
+            return rank_group_action(hand, dealer_upcard, env.remaining_ranks, self.rules, allow_split)
+        return recommend_action(hand, dealer_upcard, self.true_count(env), self.strategy, allow_split, tables=self.tables)
+
     def play_turn(self, dealer_upcard: Card, env: BlackjackEnvironment) -> List[List[str]]:
         all_actions: List[List[str]] = []
         i = 0
@@ -109,24 +233,23 @@ class BlackjackAgent(Agent):
         while i < len(self.hands):
             hand = self.hands[i]
             actions: List[str] = []
-            if hand_value(hand) == 21 and len(hand) == 2:
+            if hand.is_blackjack:
                 actions.append(Action.STAND)
-            while hand_value(hand) < 21:
-                action = recommend_action(hand, dealer_upcard, env.true_count, self.strategy)
+            while hand.total < 21:
+                action = self.recommend(hand, dealer_upcard, env)
+                self.stats['recommend_calls'] += 1
+                if action == Action.SPLIT and not self.can_split(hand, i):
+                    # look up another option, and play it like any other recommendation
+                    action = self.recommend(hand, dealer_upcard, env, allow_split=False)
+                    self.stats['recommend_calls'] += 1
                 actions.append(action)
                 if action == Action.HIT:
                     hand.append(env.deal())
                 elif action == Action.SPLIT:
-                    if self.can_split(hand, i):
-                        self.split_hand(i, env)
-                    else:
-                        # look up another option
-                        other_action = recommend_action(hand, dealer_upcard, env.true_count, self.strategy, allow_split=False)
-                        if other_action == Action.HIT:
-                            hand.append(env.deal())
-                        else:
-                            other_action = Action.STAND
-                        actions[-1] = other_action
+                    if not self.can_split(hand, i):
+                        actions[-1] = Action.STAND
+                        break  # Asking again would just recommend the split again
+                    self.split_hand(i, env)
                 elif action in (Action.DOUBLE_HIT, Action.DOUBLE_STAND):
                     if self.can_double(hand, i):
                         self.double_hand(i, env)
@@ -138,6 +261,17 @@ class BlackjackAgent(Agent):
                             hand.append(env.deal())
                         elif action == Action.DOUBLE_STAND:
                             actions[-1] = Action.STAND
+                            break
+                elif action in (Action.SURRENDER_HIT, Action.SURRENDER_STAND):
+                    if self.can_surrender(hand, i):
+                        self.surrender_hand(i)
+                        break
+                    elif action == Action.SURRENDER_HIT:
+                        actions[-1] = Action.HIT
+                        hand.append(env.deal())
+                    else:
+                        actions[-1] = Action.STAND
+                        break
                 elif action == Action.STAND:
                     break
                 else:
@@ -156,7 +290,7 @@ class HumanAgent(Agent):
         print("--- betting ---")
         print(f"Current True Count: {true_count:.2f}")
         bet = self.ui.prompt_bet(int(self.bankroll))
-        self.hand_bets.append(bet)
+        self.bet = bet
         return bet
 
     def play_turn(self, dealer_upcard: Card, env: BlackjackEnvironment) -> List[List[str]]:
@@ -165,16 +299,19 @@ class HumanAgent(Agent):
         while i < len(self.hands):
             hand = self.hands[i]
             actions: List[str] = []
-            while hand_value(hand) < 21:
+            while hand.total < 21:
                 self.ui.display_hand(hand, f"Your Hand {i + 1}")
                 valid_actions = self.get_valid_actions(hand, i)
-                action = self.ui.prompt_action(valid_actions, hand, dealer_upcard)
+                action = self.ui.prompt_action(valid_actions, hand, dealer_upcard, self.tables)
                 actions.append(action)
 
                 if action == Action.HIT:
                     hand.append(env.deal())
                 elif action == Action.SPLIT and Action.SPLIT in valid_actions:
                     self.split_hand(i, env)
+                elif action == Action.SURRENDER and action in valid_actions:
+                    self.surrender_hand(i)
+                    break
                 elif action == Action.DOUBLE and action in valid_actions:
                     if self.can_double(hand, i):
                         self.double_hand(i, env)
@@ -191,13 +328,15 @@ class HumanAgent(Agent):
             time.sleep(0.3)
         return all_actions
     
-    def get_valid_actions(self, hand: List[Card], hand_index: int) -> List[Action]:
+    def get_valid_actions(self, hand: Hand, hand_index: int) -> List[Action]:
         valid = [Action.HIT, Action.STAND]
         if self.can_double(hand, hand_index):
             # Add both double variants as valid options.
             valid.append(Action.DOUBLE)
         if self.can_split(hand, hand_index):
             valid.append(Action.SPLIT)
+        if self.can_surrender(hand, hand_index):
+            valid.append(Action.SURRENDER)
         return valid
 
     def split_hand(self, hand_index: int, env: BlackjackEnvironment) -> None:
@@ -206,4 +345,4 @@ class HumanAgent(Agent):
 
     def double_hand(self, hand_index: int, env: BlackjackEnvironment) -> None:
         super().double_hand(hand_index, env)
-        print(f"Doubled bet to ${self.hand_bets[hand_index]:.2f}")
\ No newline at end of file
+        print(f"Doubled bet to ${self.hands[hand_index].bet:.2f}")
\ No newline at end of file
@@ -0,0 +1,454 @@
+"""
+Streaming, mergeable aggregation of simulation results.
+
+ResultsAggregator keeps per-strategy running statistics in bounded memory:
+Welford mean/variance for profit and bankroll, a mergeable quantile sketch
+of profit per round (for the five-number summary) and ruin counts. It can
+be fed records straight from a simulation (it is a ResultSink), or chunk
+by chunk from a CSV or columnar store. Aggregates from separate runs merge
+without the raw rows, and round-trip through JSON.
+
+PairedComparison matches strategies within each sim instead, reporting the
+mean difference in profit per round with its paired standard error; with
+simulate_games(paired=True) the card luck cancels out of the difference.
+"""
+import csv
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from results import COLUMN_NAMES, RESULT_COLUMNS, Record, ResultSink, iter_result_chunks
+
+# Same threshold analyze_games.py uses for "went broke"
+RUIN_BANKROLL = 1000
+# Normal quantile for two-sided 95% intervals
+Z_95 = 1.96
+
+
+class RunningStats:
+    """Count, mean, variance (Welford), min and max of a stream; mergeable (Chan et al.)."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.total += x
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'total': self.total,
+                'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "RunningStats":
+        stats = cls()
+        for name, value in state.items():
+            setattr(stats, name, value)
+        return stats
+
+
+class QuantileSketch:
+    """
+    KLL-style quantile sketch: levels of sorted compactors, where an item on
+    level h stands for 2**h inputs. Memory is O(k log(n/k)) and rank error
+    of order 1/k (about 1% at k=200); two sketches merge by stacking their
+    levels and compacting.
+    Compaction alternates which half it keeps per level, so results are
+    deterministic.
+    """
+
+    def __init__(self, k: int = 200) -> None:
+        self.k = k
+        self.count = 0
+        self.levels: List[List[float]] = [[]]
+        self.flips: List[int] = [0]
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def add(self, x: float) -> None:
+        self.levels[0].append(x)
+        self.count += 1
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def _compress(self) -> None:
+        for level in range(len(self.levels)):
+            if len(self.levels[level]) < self._capacity(level):
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+                self.flips.append(0)
+            items = sorted(self.levels[level])
+            # An odd item out stays behind so total weight is preserved
+            keep = [items.pop()] if len(items) % 2 else []
+            self.levels[level + 1].extend(items[self.flips[level]::2])
+            self.flips[level] ^= 1
+            self.levels[level] = keep
+
+    def merge(self, other: "QuantileSketch") -> None:
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+            self.flips.append(0)
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self._compress()
+
+    def quantile(self, q: float) -> float:
+        weighted = sorted((x, 1 << level) for level, items in enumerate(self.levels) for x in items)
+        if not weighted:
+            return math.nan
+        target = q * sum(weight for _, weight in weighted)
+        seen = 0
+        for x, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return x
+        return weighted[-1][0]
+
+    def to_dict(self) -> dict:
+        return {'k': self.k, 'count': self.count, 'levels': self.levels, 'flips': self.flips}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "QuantileSketch":
+        sketch = cls(state['k'])
+        sketch.count = state['count']
+        sketch.levels = [list(items) for items in state['levels']]
+        sketch.flips = list(state['flips'])
+        return sketch
+
+
+class StrategyAggregate:
+    """Running statistics for the result rows of one strategy."""
+
+    def __init__(self, k: int = 200) -> None:
+        self.total_profit = RunningStats()
+        self.final_bankroll = RunningStats()
+        self.avg_profit = RunningStats()
+        self.avg_profit_sketch = QuantileSketch(k)
+        self.broke = 0
+
+    def add(self, total_profit: float, avg_profit: float, final_bankroll: float) -> None:
+        self.total_profit.add(total_profit)
+        self.final_bankroll.add(final_bankroll)
+        self.avg_profit.add(avg_profit)
+        self.avg_profit_sketch.add(avg_profit)
+        self.broke += final_bankroll < RUIN_BANKROLL
+
+    def merge(self, other: "StrategyAggregate") -> None:
+        self.total_profit.merge(other.total_profit)
+        self.final_bankroll.merge(other.final_bankroll)
+        self.avg_profit.merge(other.avg_profit)
+        self.avg_profit_sketch.merge(other.avg_profit_sketch)
+        self.broke += other.broke
+
+    @property
+    def count(self) -> int:
+        return self.total_profit.count
+
+    def five_number_summary(self) -> List[float]:
+        """min, 25%, 50%, 75%, max of profit per round (quartiles from the sketch, extremes exact)."""
+        sketch = self.avg_profit_sketch
+        return [self.avg_profit.min, sketch.quantile(0.25), sketch.quantile(0.5), sketch.quantile(0.75),
+                self.avg_profit.max]
+
+    def to_dict(self) -> dict:
+        return {'total_profit': self.total_profit.to_dict(), 'final_bankroll': self.final_bankroll.to_dict(),
+                'avg_profit': self.avg_profit.to_dict(), 'avg_profit_sketch': self.avg_profit_sketch.to_dict(),
+                'broke': self.broke}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "StrategyAggregate":
+        aggregate = cls()
+        aggregate.total_profit = RunningStats.from_dict(state['total_profit'])
+        aggregate.final_bankroll = RunningStats.from_dict(state['final_bankroll'])
+        aggregate.avg_profit = RunningStats.from_dict(state['avg_profit'])
+        aggregate.avg_profit_sketch = QuantileSketch.from_dict(state['avg_profit_sketch'])
+        aggregate.broke = state['broke']
+        return aggregate
+
+
+class ResultsAggregator(ResultSink):
+    """
+    Per-strategy StrategyAggregates over a stream of result records. As a
+    sink it folds records in as they arrive instead of buffering them.
+    """
+
+    def __init__(self, k: int = 200) -> None:
+        super().__init__()
+        self.k = k
+        self.strategies: Dict[str, StrategyAggregate] = {}
+
+    def write(self, records: Iterable[Record]) -> None:
+        strategy_col = COLUMN_NAMES.index("strategy")
+        total_col = COLUMN_NAMES.index("total_profit")
+        avg_col = COLUMN_NAMES.index("avg_profit")
+        bankroll_col = COLUMN_NAMES.index("final_bankroll")
+        for record in records:
+            self.add(record[strategy_col], record[total_col], record[avg_col], record[bankroll_col])
+
+    def write_chunk(self, records: List[Record]) -> None:
+        self.write(records)
+
+    def position(self) -> dict:
+        # Held in memory, so the position is the aggregate state itself
+        return self.to_dict()
+
+    def truncate(self, position: dict) -> None:
+        self.buffer = []
+        self.strategies = ResultsAggregator.from_dict(position).strategies
+
+    def add(self, strategy: str, total_profit: float, avg_profit: float, final_bankroll: float) -> None:
+        aggregate = self.strategies.get(strategy)
+        if aggregate is None:
+            aggregate = self.strategies[strategy] = StrategyAggregate(self.k)
+        aggregate.add(float(total_profit), float(avg_profit), float(final_bankroll))
+
+    def add_columns(self, columns: dict) -> None:
+        """Folds in a chunk of columns (as from results.load_results)."""
+        for values in zip(columns["strategy"], columns["total_profit"], columns["avg_profit"],
+                          columns["final_bankroll"]):
+            self.add(str(values[0]), *values[1:])
+
+    def half_widths(self, z: float = Z_95) -> Dict[str, float]:
+        """Half-width of the confidence interval on each strategy's mean profit per round."""
+        return {name: z * agg.avg_profit.std / math.sqrt(agg.count) if agg.count > 1 else math.inf
+                for name, agg in self.strategies.items()}
+
+    def merge(self, other: "ResultsAggregator") -> None:
+        for strategy, aggregate in other.strategies.items():
+            if strategy in self.strategies:
+                self.strategies[strategy].merge(aggregate)
+            else:
+                self.strategies[strategy] = StrategyAggregate.from_dict(aggregate.to_dict())
+
+    def to_dict(self) -> dict:
+        return {'k': self.k, 'strategies': {name: agg.to_dict() for name, agg in self.strategies.items()}}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "ResultsAggregator":
+        aggregator = cls(state['k'])
+        aggregator.strategies = {name: StrategyAggregate.from_dict(agg) for name, agg in state['strategies'].items()}
+        return aggregator
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "ResultsAggregator":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def write_reports(self, stats_file: str = "Blackjack_strategy_stats.csv",
+                      broke_file: str = "Broke_agents_stats.csv",
+                      summary_file: Optional[str] = "Profit_per_hand_5num_summary.csv") -> None:
+        """Writes the per-strategy CSVs analyze_games.py produces, sorted by strategy."""
+        names = sorted(self.strategies)
+        with open(stats_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Strategy", "Mean_Total_Profit", "Mean_Final_Bankroll", "Mean_Profit_Per_Round"])
+            for name in names:
+                agg = self.strategies[name]
+                writer.writerow([name, agg.total_profit.mean, agg.final_bankroll.mean, agg.avg_profit.mean])
+        with open(broke_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Strategy", "Broke Agents Count", "Broke Agents Proportion", "Net Profit/Loss"])
+            for name in names:
+                agg = self.strategies[name]
+                writer.writerow([name, agg.broke, round(agg.broke / agg.count, 3), round(agg.total_profit.total, 2)])
+        if summary_file is None:
+            return
+        with open(summary_file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Strategy", "Net Profit/Loss", "Proportion Broke", "min", "25%", "50%", "75%", "max"])
+            for name in names:
+                agg = self.strategies[name]
+                writer.writerow([name, round(agg.total_profit.total, 2), round(agg.broke / agg.count, 3)] +
+                                [round(x, 2) for x in agg.five_number_summary()])
+
+
+class PairedComparison(ResultSink):
+    """
+    Paired differences in profit per round between the strategies of each
+    sim. Records of one sim arrive together (simulate_games writes them in
+    sim_id order); a sim's values are paired once the next sim starts, or on
+    close. Strategies are compared later minus earlier in SIM_STRATEGIES order
+    (any others after those, by name), e.g. counting - basic, whatever order a
+    sim's records come in; an agent that went broke is written after the others.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # (later, earlier) -> stats of the difference, of later alone, of earlier alone
+        self.pairs: Dict[Tuple[str, str], Tuple[RunningStats, RunningStats, RunningStats]] = {}
+        self.sim_id = None
+        self.pending: Dict[str, float] = {}
+
+    def write(self, records: Iterable[Record]) -> None:
+        sim_col = COLUMN_NAMES.index("sim_id")
+        strategy_col = COLUMN_NAMES.index("strategy")
+        avg_col = COLUMN_NAMES.index("avg_profit")
+        for record in records:
+            self.add(record[sim_col], record[strategy_col], record[avg_col])
+
+    def write_chunk(self, records: List[Record]) -> None:
+        self.write(records)
+
+    def add(self, sim_id: int, strategy: str, avg_profit: float) -> None:
+        if sim_id != self.sim_id:
+            self._pair_pending()
+            self.sim_id = sim_id
+        self.pending[str(strategy)] = float(avg_profit)
+
+    def _pair_pending(self) -> None:
+        # Deferred: game imports this module
+        from game import SIM_STRATEGIES
+        names = sorted(self.pending, key=lambda name: (
+            SIM_STRATEGIES.index(name) if name in SIM_STRATEGIES else len(SIM_STRATEGIES), name))
+        for i, later in enumerate(names):
+            for earlier in names[:i]:
+                stats = self.pairs.get((later, earlier))
+                if stats is None:
+                    stats = self.pairs[(later, earlier)] = (RunningStats(), RunningStats(), RunningStats())
+                stats[0].add(self.pending[later] - self.pending[earlier])
+                stats[1].add(self.pending[later])
+                stats[2].add(self.pending[earlier])
+        self.pending = {}
+
+    def close(self) -> None:
+        self._pair_pending()
+
+    def position(self) -> dict:
+        # Held in memory, so the position is the comparison state itself
+        return self.to_dict()
+
+    def truncate(self, position: dict) -> None:
+        self.buffer = []
+        restored = PairedComparison.from_dict(position)
+        self.pairs, self.sim_id, self.pending = restored.pairs, restored.sim_id, restored.pending
+
+    def to_dict(self) -> dict:
+        return {'pairs': [[later, earlier, [stats.to_dict() for stats in triple]]
+                          for (later, earlier), triple in self.pairs.items()],
+                'sim_id': self.sim_id, 'pending': dict(self.pending)}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "PairedComparison":
+        comparison = cls()
+        comparison.pairs = {(later, earlier): tuple(RunningStats.from_dict(stats) for stats in triple)
+                            for later, earlier, triple in state['pairs']}
+        comparison.sim_id = state['sim_id']
+        comparison.pending = dict(state['pending'])
+        return comparison
+
+    def summary(self) -> List[dict]:
+        """
+        One row per strategy pair: the mean difference, its paired standard
+        error and 95% interval, and the standard error the same sims would
+        give if the strategies had been sampled independently.
+        """
+        self._pair_pending()
+        rows = []
+        for (later, earlier), (diff, first, second) in self.pairs.items():
+            std_error = diff.std / math.sqrt(diff.count)
+            unpaired = math.sqrt((first.variance + second.variance) / diff.count)
+            rows.append({
+                'Comparison': f"{later} - {earlier}",
+                'Sims': diff.count,
+                'Mean_Difference_Per_Round': diff.mean,
+                'Std_Error': std_error,
+                'CI95_Low': diff.mean - Z_95 * std_error,
+                'CI95_High': diff.mean + Z_95 * std_error,
+                'Unpaired_Std_Error': unpaired,
+                # Sims an unpaired comparison would need for the same standard error
+                'Sims_Saved_Factor': (unpaired / std_error) ** 2 if std_error else math.inf,
+            })
+        return rows
+
+    def half_widths(self, z: float = Z_95) -> Dict[str, float]:
+        """Half-width of the confidence interval on each pair's mean difference."""
+        self._pair_pending()
+        return {f"{later} - {earlier}": z * diff.std / math.sqrt(diff.count) if diff.count > 1 else math.inf
+                for (later, earlier), (diff, _, _) in self.pairs.items()}
+
+    def write_report(self, path: str = "Paired_strategy_differences.csv") -> None:
+        rows = self.summary()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            if rows:
+                writer.writerow(list(rows[0]))
+            for row in rows:
+                writer.writerow(list(row.values()))
+
+
+def paired_comparison(path: str = "strat_comparisons.csv") -> PairedComparison:
+    """Streams a results CSV, or a columnar store directory, into a PairedComparison."""
+    comparison = PairedComparison()
+    if os.path.isdir(path):
+        for columns in iter_result_chunks(path):
+            for values in zip(columns["sim_id"], columns["strategy"], columns["avg_profit"]):
+                comparison.add(int(values[0]), *values[1:])
+    else:
+        headers = [header for header, _, _ in RESULT_COLUMNS]
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                comparison.add(int(row[headers[0]]), row[headers[3]], row[headers[8]])
+    comparison.close()
+    return comparison
+
+
+def aggregate_results(path: str = "strat_comparisons.csv", chunk_rows: int = 65536,
+                      aggregator: Optional[ResultsAggregator] = None) -> ResultsAggregator:
+    """
+    Streams a results CSV, or a columnar store directory, into an aggregator.
+    Only one chunk of rows is held in memory at a time.
+    """
+    if aggregator is None:
+        aggregator = ResultsAggregator()
+    if os.path.isdir(path):
+        # Parts are memory-mapped; walk each in slices
+        for columns in iter_result_chunks(path):
+            rows = len(columns["sim_id"])
+            for start in range(0, rows, chunk_rows):
+                aggregator.add_columns({name: values[start:start + chunk_rows] for name, values in columns.items()})
+        return aggregator
+    headers = [header for header, _, _ in RESULT_COLUMNS]
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            aggregator.add(row[headers[3]], row[headers[7]], row[headers[8]], row[headers[9]])
+    return aggregator
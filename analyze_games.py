@@ -1,10 +1,38 @@
+import os
+import sys
+from aggregate import aggregate_results, paired_comparison
+
+# Load the simulation results
+file_path = "strat_comparisons.csv"  # Ensure this matches where `game.py` saves results
+store_path = "strat_comparisons"  # Columnar store (results.ColumnarSink); memory-mapped, no text parsing
+
+if "--streaming" in sys.argv[1:]:
+    # One pass in bounded memory: writes the stats CSVs without building a DataFrame (no plots)
+    aggregator = aggregate_results(store_path if os.path.isdir(store_path) else file_path)
+    aggregator.write_reports()
+    for name, stats in sorted(aggregator.strategies.items()):
+        print(f"{name}: {stats.count} agents, mean profit/round {stats.avg_profit.mean:.4f} "
+              f"(sd {stats.avg_profit.std:.4f}), broke {stats.broke}")
+    sys.exit()
+
+if "--paired" in sys.argv[1:]:
+    # Strategy differences matched within each sim; most useful on simulate_games(paired=True) output
+    comparison = paired_comparison(store_path if os.path.isdir(store_path) else file_path)
+    comparison.write_report()
+    for row in comparison.summary():
+        print(f"{row['Comparison']}: {row['Mean_Difference_Per_Round']:+.4f} per round "
+              f"(se {row['Std_Error']:.4f}, unpaired se {row['Unpaired_Std_Error']:.4f}) over {row['Sims']} sims")
+    sys.exit()
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from results import load_results_frame
 
-# Load the simulation results
-file_path = "strat_comparisons.csv"  # Ensure this matches where `game.py` saves results
-df = pd.read_csv(file_path)
+if os.path.isdir(store_path):
+    df = load_results_frame(store_path)
+else:
+    df = pd.read_csv(file_path)
 
 # Compute win, loss, and push percentages
 df["Win %"] = df["Wins"] / (df["Wins"] + df["Losses"] + df["Pushes"])
@@ -0,0 +1,245 @@
+"""
+Throughput benchmarks for the simulation hot paths.
+
+    python benchmarks.py                          # run everything, print a table
+    python benchmarks.py -o bench.json            # also save results as JSON
+    python benchmarks.py --compare bench.json     # flag regressions against a saved run
+
+Microbenchmarks report calls per second; end-to-end benchmarks play fixed-
+seed tables with 1, 3 and 7 agents on 1, 4 and 8 decks and report hands per
+second. The vectorized suite reports hands per second for batch_sim and
+decision steps per second for vec_env. Every figure is the best of several
+repeats, higher is better.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from agent import Agent, BlackjackAgent
+from environment import BlackjackEnvironment, Card
+from game import SIM_STRATEGIES, BlackjackGame
+from utils import Hand, hand_value, recommend_action
+
+AGENT_COUNTS = (1, 3, 7)
+DECK_COUNTS = (1, 4, 8)
+
+
+def _sample_hands(count: int, seed: int) -> Tuple[List[Hand], List[Card]]:
+    """Random 2- and 3-card hands below 21 with dealer upcards, as the agents see them."""
+    rng = random.Random(seed)
+    hands, upcards = [], []
+    while len(hands) < count:
+        hand = Hand(Card(rng.randint(1, 4), rng.randint(1, 13)) for _ in range(rng.choice((2, 2, 3))))
+        if hand.total < 21:
+            hands.append(hand)
+            upcards.append(Card(rng.randint(1, 4), rng.randint(1, 13)))
+    return hands, upcards
+
+
+def _best_rate(func: Callable[[], int], repeat: int) -> float:
+    """Runs func (which returns how many operations it did) repeat times; best ops/sec."""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = func()
+        best = max(best, ops / (time.perf_counter() - start))
+    return best
+
+
+def micro_benchmarks(repeat: int = 5, quick: bool = False) -> Dict[str, float]:
+    results = {}
+    hands, upcards = _sample_hands(2000, seed=1)
+    list_hands = [list(hand) for hand in hands]
+    loops = 2 if quick else 10
+
+    def bench_hand_value():
+        for _ in range(loops):
+            for hand in list_hands:
+                hand_value(hand)
+        return loops * len(list_hands)
+    results['hand_value'] = _best_rate(bench_hand_value, repeat)
+
+    for strategy in SIM_STRATEGIES:
+        def bench_recommend(strategy=strategy):
+            for _ in range(loops):
+                for hand, upcard in zip(hands, upcards):
+                    recommend_action(hand, upcard, 1.5, strategy)
+            return loops * len(hands)
+        results[f'recommend_action[{strategy}]'] = _best_rate(bench_recommend, repeat)
+
+    for num_decks in DECK_COUNTS:
+        env = BlackjackEnvironment(num_decks, rng=random.Random(2))
+        shoes = 20 if quick else 100
+
+        def bench_reset():
+            for _ in range(shoes):
+                env.reset()
+            return shoes
+        results[f'env.reset[{num_decks}d]'] = _best_rate(bench_reset, repeat)
+
+        # Cards per second dealing whole shoes, reshuffles included
+        def bench_deal():
+            dealt = 0
+            for _ in range(shoes):
+                env.reset()
+                for _ in range(env.remaining_cards()):
+                    env.deal()
+                dealt += num_decks * 52
+            return dealt
+        results[f'env.reset+deal[{num_decks}d]'] = _best_rate(bench_deal, repeat)
+
+    # Settlement on dealt 7-seat rounds; process_payouts clears the hands, so restore them per call
+    env = BlackjackEnvironment(rng=random.Random(3))
+    agents = [BlackjackAgent(bankroll=10 ** 9, strategy=SIM_STRATEGIES[i % 3]) for i in range(7)]
+    game = BlackjackGame(env, agents)
+    game.set_verbose(False)
+    rounds = []
+    for _ in range(200):
+        game.place_bets()
+        upcard = game.initialize_new_round()
+        game.play_agent_turns(upcard)
+        game.play_dealer_turn()
+        rounds.append((game.dealer_hand, [agent.hands for agent in agents]))
+    passes = 5 if quick else 25
+
+    def bench_resolve():
+        for _ in range(passes):
+            for dealer_hand, agent_hands in rounds:
+                game.dealer_hand = dealer_hand
+                for agent, hands_ in zip(agents, agent_hands):
+                    agent.hands = hands_
+                game.resolve_bets()
+        return passes * len(rounds)
+    results['resolve_bets[7 agents]'] = _best_rate(bench_resolve, repeat)
+
+    def bench_payouts():
+        for _ in range(passes):
+            for dealer_hand, agent_hands in rounds:
+                game.dealer_hand = dealer_hand
+                for agent, hands_ in zip(agents, agent_hands):
+                    agent.hands = hands_
+                game.process_payouts(game.resolve_bets())
+        return passes * len(rounds)
+    results['resolve_bets+process_payouts[7 agents]'] = _best_rate(bench_payouts, repeat)
+    return results
+
+
+def play_table(num_agents: int, num_decks: int, num_rounds: int, seed: int) -> int:
+    """Plays one seeded table and returns the number of hands settled."""
+    Agent._id_counter = 1
+    env = BlackjackEnvironment(num_decks, rng=random.Random(seed))
+    # Deep bankrolls keep every seat playing for the whole run
+    agents = [BlackjackAgent(bankroll=10 ** 9, strategy=SIM_STRATEGIES[i % len(SIM_STRATEGIES)])
+              for i in range(num_agents)]
+    game = BlackjackGame(env, agents)
+    game.set_verbose(False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        game.run_simulation(num_rounds)
+    return sum(agent.stats['wins'] + agent.stats['losses'] + agent.stats['pushes'] for agent in agents)
+
+
+def end_to_end_benchmarks(repeat: int = 3, quick: bool = False, seed: int = 12345) -> Dict[str, float]:
+    results = {}
+    num_rounds = 200 if quick else 1000
+    for num_agents in AGENT_COUNTS:
+        for num_decks in DECK_COUNTS:
+            results[f'simulate[{num_agents} agents, {num_decks}d]'] = _best_rate(
+                lambda: play_table(num_agents, num_decks, num_rounds, seed), repeat)
+    return results
+
+
+def vectorized_benchmarks(repeat: int = 3, quick: bool = False, seed: int = 12345) -> Dict[str, float]:
+    import numpy as np
+    from batch_sim import BatchSimulator
+    results = {}
+    num_tables, num_rounds = (256, 100) if quick else (1024, 200)
+    for num_decks in DECK_COUNTS:
+        def bench(num_decks=num_decks):
+            sim = BatchSimulator(num_tables, SIM_STRATEGIES, num_decks=num_decks, bankroll=10 ** 9,
+                                 rng=np.random.default_rng(seed))
+            sim.run(num_rounds)
+            return int((sim.wins + sim.losses + sim.pushes).sum())
+        results[f'batch_sim[3 agents, {num_decks}d]'] = _best_rate(bench, repeat)
+
+    from vec_env import HIT, STAND, VecBlackjackEnv
+    num_steps = 100 if quick else 500
+
+    def bench_steps():
+        env = VecBlackjackEnv(num_tables, rng=np.random.default_rng(seed))
+        obs, _ = env.reset()
+        for _ in range(num_steps):
+            # Hit below 17; an opening blackjack (21) can only stand
+            obs = env.step(np.where(obs['total'] < 17, HIT, STAND))[0]
+        return num_tables * num_steps
+    results[f'vec_env.step[{num_tables} tables, 4d]'] = _best_rate(bench_steps, repeat)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Names whose rate fell more than threshold (a fraction) below the baseline."""
+    return [name for name, rate in results.items()
+            if name in baseline and rate < baseline[name] * (1 - threshold)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Blackjack simulation throughput benchmarks")
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="flag a regression when a rate drops by more than this fraction (default 0.10)")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads, for a fast sanity run")
+    parser.add_argument("--suite", choices=("micro", "e2e", "vectorized", "all"), default="all")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results: Dict[str, float] = {}
+    if args.suite in ("micro", "all"):
+        results.update(micro_benchmarks(args.repeat, args.quick))
+    if args.suite in ("e2e", "all"):
+        results.update(end_to_end_benchmarks(max(1, args.repeat // 2), args.quick))
+    if args.suite in ("vectorized", "all"):
+        try:
+            results.update(vectorized_benchmarks(max(1, args.repeat // 2), args.quick))
+        except ImportError:
+            print("numpy not installed; skipping vectorized benchmarks", file=sys.stderr)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    for name, rate in results.items():
+        line = f"{name:45s} {rate:14,.0f} /s"
+        if baseline.get(name):
+            line += f"  {rate / baseline[name] - 1:+7.1%}"
+            if name in regressions:
+                line += "  REGRESSION"
+        print(line)
+
+    if args.output:
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "quick": args.quick,
+                "repeat": args.repeat,
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
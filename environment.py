@@ -1,5 +1,8 @@
 import random
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Union
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 class Card:
@@ -7,22 +10,65 @@ class Card:
     A playing card with 1-based indexing for suits and faces:
       suit in {1..4}, face in {1..13}
     Where face=1 => Ace, 2..10 => 2..10, 11 => Jack, 12 => Queen, 13 => King.
+
+    Cards are immutable and interned: Card(suit, face) always returns one of
+    52 shared instances, whose blackjack value, Hi-Lo tag and strategy-table
+    keys are computed once at import.
     """
     # For human-readable printing: index 1 => Ace
     FACES_HUMAN = [None, 'A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
     # Index 1 => spade, 2 => heart, 3 => diamond, 4 => club
     SUITS_HUMAN = [None, u"\u2660", u"\u2665", u"\u2666", u"\u2663"]
+    # Strategy-table dealer columns, in order; J, Q, K share the '10' column
+    DEALER_KEYS = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'A')
+
+    __slots__ = ('suit', 'face', 'code', 'points', 'hi_lo', 'rank', 'ace', 'dealer_key', 'dealer_index', 'pair_key')
+    _interned: tuple = ()
 
-    def __init__(self, suit: int, face: int) -> None:
+    def __new__(cls, suit: int, face: int) -> "Card":
         """
         suit: int in [1..4]
         face: int in [1..13]
         """
-        self.suit: int = suit
-        self.face: int = face
+        if not (1 <= suit <= 4 and 1 <= face <= 13):
+            raise ValueError(f"Invalid card: suit={suit}, face={face}")
+        return cls._interned[(suit - 1) * 13 + face - 1]
+
+    @classmethod
+    def _build(cls, suit: int, face: int) -> "Card":
+        card = object.__new__(cls)
+        fields = {
+            'suit': suit,
+            'face': face,
+            'code': (suit - 1) * 13 + face - 1,
+            # Ace as 11, J/Q/K as 10
+            'points': 11 if face == 1 else min(face, 10),
+            # 2..6 => +1, 7..9 => 0, tens and aces => -1
+            'hi_lo': 1 if 2 <= face <= 6 else 0 if 7 <= face <= 9 else -1,
+            # Rank-count slot: 0 => ace, 1..8 => 2..9, 9 => ten-valued
+            'rank': 0 if face == 1 else min(face, 10) - 1,
+            'ace': face == 1,
+            'dealer_key': 'A' if face == 1 else str(min(face, 10)),
+            'dealer_index': 9 if face == 1 else min(face, 10) - 2,
+            # Pair rows of BASIC_STRATEGY are keyed 'AA', '22'..'99', 'TT'
+            'pair_key': 'T' if face >= 10 else Card.FACES_HUMAN[face],
+        }
+        for name, value in fields.items():
+            object.__setattr__(card, name, value)
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):
+        # Unpickles to the interned instance
+        return Card, (self.suit, self.face)
 
     def is_ace(self) -> bool:
-        return self.face == 1
+        return self.ace
 
     def get_face(self) -> str:
         return Card.FACES_HUMAN[self.face]
@@ -37,12 +83,7 @@ class Card:
           - 2..10 as 2..10
           - J, Q, K as 10
         """
-        if self.face == 1:
-            return 11  # Ace initially as 11
-        elif 2 <= self.face <= 10:
-            return self.face
-        else:
-            return 10  # J, Q, K
+        return self.points
 
     def hi_lo_value(self) -> int:
         """
@@ -52,12 +93,7 @@ class Card:
           - 10..13 => -1
           - Ace => -1
         """
-        if 2 <= self.face <= 6:
-            return 1
-        elif 7 <= self.face <= 9:
-            return 0
-        else:
-            return -1
+        return self.hi_lo
 
     def __str__(self) -> str:
         face_symbol = Card.FACES_HUMAN[self.face]
@@ -77,44 +113,201 @@ class Card:
         return hash(self.face)
 
 
+Card._interned = tuple(Card._build(suit, face) for suit in range(1, 5) for face in range(1, 14))
+
+
+# A shoe stores cards as one-byte codes: code = (suit - 1) * 13 + (face - 1), i.e. 0..51
+DECK_CODES = bytes(range(52))
+# Interned Card per code, shared by every shoe
+CODE_CARDS = Card._interned
+# Hi-Lo tag and rank slot per code, so dealing needs no attribute lookup
+CODE_HI_LO = tuple(card.hi_lo for card in CODE_CARDS)
+CODE_RANK = tuple(card.rank for card in CODE_CARDS)
+# Cards per rank slot (A, 2..9, T) in one deck
+DECK_RANKS = (4,) * 9 + (16,)
+
+# Tags per rank slot (A, 2..9, T) of the counting systems an environment can report.
+# KO is unbalanced; its counts start from 0 rather than a pivot-adjusted initial count.
+COUNT_SYSTEMS = {
+    'hi_lo': (-1, 1, 1, 1, 1, 1, 0, 0, 0, -1),
+    'ko': (-1, 1, 1, 1, 1, 1, 1, 0, 0, -1),
+    'hi_opt_ii': (0, 1, 1, 2, 2, 1, 1, 0, 0, -2),
+    'omega_ii': (0, 1, 1, 2, 2, 2, 1, 0, -1, -2),
+    'zen': (-1, 1, 1, 2, 2, 2, 1, 0, 0, -2),
+}
+
+
+def check_count_system(name: str) -> None:
+    if name not in COUNT_SYSTEMS:
+        raise ValueError(f"Unknown counting system: {name}")
+
+
+class ShuffledShoes:
+    """
+    Shuffled copies of a shoe from a numpy Generator, made block at a time
+    (each row permuted independently in C) and handed out in order, so a
+    table's shoes depend only on its Generator's seed.
+    """
+
+    def __init__(self, generator: "np.random.Generator", ordered_shoe: bytes, block: int = 64) -> None:
+        import numpy as np
+        self.generator = generator
+        self.ordered = np.frombuffer(ordered_shoe, dtype=np.uint8)
+        self.block = block
+        self.shoes: List[bytes] = []
+
+    def next(self) -> bytes:
+        if not self.shoes:
+            rows = self.generator.permuted(self.ordered[None, :].repeat(self.block, axis=0), axis=1)
+            # Handed out from the end, so reverse to keep generation order
+            self.shoes = [row.tobytes() for row in rows[::-1]]
+        return self.shoes.pop()
+
+
 class BlackjackEnvironment:
     """
-    Environment that constructs a shoe (deck) of Card objects
-    and manages dealing and the Hi-Lo running count.
+    Environment that holds a shoe of card codes and manages dealing
+    and the Hi-Lo running count.
+
+    It also keeps how many cards of each rank are left unseen
+    (remaining_ranks), from which running_counts and true_counts give
+    any COUNT_SYSTEMS counts in one pass.
+
+    With a random.Random (or the global random module), the shoe is
+    shuffled lazily: deal() runs one Fisher-Yates step, picking the card at
+    random from those left, so a shuffle costs only the cards actually
+    dealt before the next one. The cards come out exactly as from
+    random.shuffle of the same shoe, and a seeded rng deals the same first
+    shoe as an eagerly shuffled one. With a numpy.random.Generator (e.g.
+    PCG64 or Philox, spawned per table; see game.sim_rng), whole shuffled
+    shoes are made in blocks by ShuffledShoes and deal() just takes the
+    next card.
+
+    The game reshuffles at the start of a round once fewer than cut_card
+    cards are left: 52 by default, or the cards left at the given
+    penetration (fraction of the shoe dealt). With continuous, the shoe
+    models a continuous shuffling machine: start_round puts the last
+    round's cards back before the bets, so every round deals from a full
+    shoe with a zero count.
     """
 
-    def __init__(self, num_decks: int = 4) -> None:
+    def __init__(self, num_decks: int = 4, rng: Union[random.Random, "np.random.Generator", None] = None,
+                 penetration: Optional[float] = None, continuous: bool = False) -> None:
         self.num_decks: int = num_decks
-        self.deck: List[Card] = []
+        # Shuffles draw from rng when given (seeded, per-table stream), else the global random module
+        self.rng = rng if rng is not None else random
+        # Allocated once; reset() restores deck order in place, so a seeded
+        # rng deals the same sequence as a freshly built shoe
+        self.ordered_shoe: bytes = DECK_CODES * num_decks
+        self.shoe: bytearray = bytearray(self.ordered_shoe)
+        if hasattr(self.rng, "permuted"):
+            # numpy Generator: shoes come pre-shuffled, so deal() draws nothing
+            self.shuffled_shoes: Optional[ShuffledShoes] = ShuffledShoes(self.rng, self.ordered_shoe)
+            self.randbelow = None
+        else:
+            self.shuffled_shoes = None
+            # random.shuffle's own draw (Random._randbelow); the module-level functions only offer
+            # randrange, which draws the same numbers
+            self.randbelow = getattr(self.rng, "_randbelow", self.rng.randrange)
+        if penetration is None:
+            self.cut_card: int = 52
+        elif 0 < penetration < 1:
+            self.cut_card = max(1, round(len(self.shoe) * (1 - penetration)))
+        else:
+            raise ValueError(f"Penetration must be between 0 and 1, not {penetration}")
+        self.penetration = penetration
+        self.continuous = continuous
+        # Cards are dealt from the end of the shoe; cursor is the number left,
+        # shoe[:cursor] holding them in deal order if pre-shuffled, else in no particular order
+        self.cursor: int = 0
         self.running_count: int = 0
         self.cards_seen: int = 0
+        self.full_ranks: List[int] = [count * num_decks for count in DECK_RANKS]
+        self.remaining_ranks: List[int] = list(self.full_ranks)
+        # Lifetime counters: shuffles (including the first) and cards dealt from earlier shoes
+        self.shuffles: int = 0
+        self.cards_dealt_before: int = 0
         self.reset()
 
     def reset(self) -> None:
-        self.deck = []
-        # For each deck in the shoe:
-        for _ in range(self.num_decks):
-            for suit in range(1, 5):
-                for face in range(1, 14):
-                    self.deck.append(Card(suit, face))
-        random.shuffle(self.deck)
+        """Gathers every card back into the shoe (shuffled as they are dealt, unless pre-shuffled)."""
+        self.shuffles += 1
+        self.cards_dealt_before += self.cards_seen
+        self.shoe[:] = self.ordered_shoe if self.shuffled_shoes is None else self.shuffled_shoes.next()
+        self.cursor = len(self.shoe)
         self.running_count = 0
         self.cards_seen = 0
+        self.remaining_ranks[:] = self.full_ranks
+
+    def start_round(self) -> None:
+        """Called before each round's bets: a continuous shuffler takes the last round's cards back."""
+        if self.continuous and self.cards_seen:
+            self.reset()
+
+    def needs_shuffle(self) -> bool:
+        """Whether the cut card has come out."""
+        return self.cursor < self.cut_card
 
     def deal(self, reveal: bool = True) -> Card:
-        card = self.deck.pop()
+        cursor = self.cursor - 1
+        if cursor > 0 and self.randbelow is not None:
+            # One Fisher-Yates step: a random card of those left, whose slot takes the last one left
+            j = self.randbelow(cursor + 1)
+            shoe = self.shoe
+            code = shoe[j]
+            shoe[j] = shoe[cursor]
+            shoe[cursor] = code
+        elif cursor >= 0:
+            code = self.shoe[cursor]
+        else:
+            # Ran dry mid-round (deep penetration at a full table): the whole shoe goes back in
+            self.reset()
+            return self.deal(reveal)
+        self.cursor = cursor
         self.cards_seen += 1
         if reveal:
-            self.update_count(card)
-        return card
+            self.running_count += CODE_HI_LO[code]
+            self.remaining_ranks[CODE_RANK[code]] -= 1
+        return CODE_CARDS[code]
 
     def update_count(self, card: Card) -> None:
-        self.running_count += card.hi_lo_value()
+        self.running_count += card.hi_lo
+        self.remaining_ranks[card.rank] -= 1
+
+    def running_counts(self, systems: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Running count under each named counting system (default: all of COUNT_SYSTEMS)."""
+        seen = [full - left for full, left in zip(self.full_ranks, self.remaining_ranks)]
+        counts = {}
+        for name in COUNT_SYSTEMS if systems is None else systems:
+            check_count_system(name)
+            counts[name] = sum(tag * count for tag, count in zip(COUNT_SYSTEMS[name], seen))
+        return counts
+
+    def true_counts(self, systems: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Running counts per remaining deck, as true_count is for Hi-Lo."""
+        remaining_decks = max(self.cursor / 52.0, 0.5)
+        return {name: count / remaining_decks for name, count in self.running_counts(systems).items()}
+
+    def true_count_for(self, system: str) -> float:
+        if system == 'hi_lo':
+            # Kept incrementally, no need for the rank counts
+            return self.true_count
+        return self.true_counts((system,))[system]
+
+    @property
+    def cards_dealt(self) -> int:
+        """Cards dealt over the environment's lifetime."""
+        return self.cards_dealt_before + self.cards_seen
+
+    @property
+    def deck(self) -> List[Card]:
+        """Cards still in the shoe; the next card to be dealt is last only if pre-shuffled."""
+        return [CODE_CARDS[code] for code in self.shoe[:self.cursor]]
 
     @property
     def true_count(self) -> float:
-        remaining_decks = max(len(self.deck) / 52.0, 0.5)
+        remaining_decks = max(self.cursor / 52.0, 0.5)
         return self.running_count / remaining_decks
 
     def remaining_cards(self) -> int:
-        return len(self.deck)
+        return self.cursor
@@ -1,95 +1,143 @@
+import json
 import os
+import random
 import sys
-from typing import List, Optional
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Optional, Tuple
 from ui import ConsoleUI
-from utils import hand_value
+from utils import Hand
 from environment import BlackjackEnvironment, Card
 from agent import BlackjackAgent, HumanAgent, Agent
+from hand_log import HandLog, hand_log_position, truncate_hand_log
+from instrumentation import Instrumentation
+from aggregate import PairedComparison, ResultsAggregator
+from results import COLUMN_NAMES, CsvSink, Record, ResultSink, format_csv_row
+from rules import TableRules
+
+
+SIM_STRATEGIES = ('unskilled', 'basic', 'counting')
+# Shuffle sources for sim_rng: Python's Mersenne Twister, or NumPy bit generators
+RNG_BACKENDS = ('random', 'pcg64', 'philox')
 
 
 class BlackjackGame:
-    def __init__(self, env: BlackjackEnvironment, agents: List[Agent]) -> None:
+    """
+    A table of agents against the dealer. The phase methods and play_round
+    never print; a verbose game narrates through play_round_verbose, which
+    run_simulation picks once per run, and the ConsoleUI is only created
+    when something is shown. The table plays by rules (default: the game's
+    own, for the shoe's deck count), which the agents are given too.
+    """
+
+    def __init__(self, env: BlackjackEnvironment, agents: List[Agent], verbose: bool = True,
+                 rules: Optional[TableRules] = None) -> None:
         self.env: BlackjackEnvironment = env
+        self.rules: TableRules = rules if rules is not None else TableRules(num_decks=env.num_decks)
+        if self.rules.num_decks != env.num_decks:
+            raise ValueError(f"Rules are for {self.rules.num_decks} decks, but the shoe has {env.num_decks}")
+        for agent in agents:
+            agent.set_rules(self.rules)
         self.agents: List[Agent] = agents
         self.dropped_agents: List[Agent] = []  # Track agents that go broke
-        self.dealer_hand: List[Card] = []
-        self.ui = ConsoleUI()
-        self.verbose = True
+        self.dealer_hand: Hand = Hand()
+        self._ui: Optional[ConsoleUI] = None
+        self.verbose = verbose
+        self.instrumentation: Optional[Instrumentation] = None
+        self.hand_log: Optional[HandLog] = None
+
+    @property
+    def ui(self) -> ConsoleUI:
+        if self._ui is None:
+            self._ui = ConsoleUI()
+        return self._ui
 
     def set_verbose(self, verbose: bool):
         self.verbose = verbose
 
+    def enable_instrumentation(self) -> Instrumentation:
+        """Turns on per-phase timing and counters for later run_simulation calls."""
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation()
+        return self.instrumentation
+
+    def enable_hand_log(self, sim_id: int = 0) -> HandLog:
+        """Turns on the per-round outcome log (see hand_log.py), tagging entries with sim_id."""
+        if self.hand_log is None:
+            self.hand_log = HandLog(sim_id)
+        return self.hand_log
+
     def place_bets(self) -> None:
-        if self.verbose:
-            print(f"True Count: {self.env.true_count:.2f}")
+        self.env.start_round()
         for agent in self.agents:
-            bet = agent.place_bet(self.env.true_count)
-            if self.verbose:
-                print(f"Player {agent.id} bets: ${bet}")
+            true_count = agent.true_count(self.env)
+            agent.place_bet(true_count)
+            if self.hand_log is not None:
+                self.hand_log.bet_counts[agent.id] = true_count
 
     def initialize_new_round(self) -> Card:
-        if self.env.remaining_cards() < 52:
+        if self.env.needs_shuffle():
             self.env.reset()
 
-        self.dealer_hand = [
+        self.dealer_hand = Hand([
             self.env.deal(reveal=False),
             self.env.deal()
-        ]
+        ])
         dealer_upcard: Card = self.dealer_hand[1]
         for agent in self.agents:
-            agent.hands = [[self.env.deal(), self.env.deal()]]  # Initialize with one hand
+            agent.hands = [Hand([self.env.deal(), self.env.deal()], bet=agent.bet)]  # Initialize with one hand
         return dealer_upcard
 
     def play_agent_turns(self, dealer_upcard: Card):
         for agent in self.agents:
-            if self.verbose:
-                print(f"\n--- Player {agent.id}'s Turn ---")
+            agent.play_turn(dealer_upcard, self.env)
+
+    def play_agent_turns_verbose(self, dealer_upcard: Card):
+        for agent in self.agents:
+            print(f"\n--- Player {agent.id}'s Turn ---")
             actions = agent.play_turn(dealer_upcard, self.env)
-            if self.verbose:
-                print(f"Actions taken: {actions}")
-                for i, hand in enumerate(agent.hands):
-                    self.ui.display_hand(hand, f"Player {agent.id} Hand {i + 1}")
+            print(f"Actions taken: {actions}")
+            for i, hand in enumerate(agent.hands):
+                self.ui.display_hand(hand, f"Player {agent.id} Hand {i + 1}")
 
     def play_dealer_turn(self) -> None:
-        if self.verbose:
-            print("\n--- Dealer's Turn ---")
         self.env.update_count(self.dealer_hand[0])
-        dealer_score = hand_value(self.dealer_hand)
-        if self.verbose:
-            print(f"Dealer reveals: {self.dealer_hand[0]} (Total: {dealer_score})")
-        if dealer_score == 21 and len(self.dealer_hand) == 2:
+        if self.dealer_hand.is_blackjack:
             return
 
-        # stand on soft 17
-        while dealer_score < 17:
-            new_card = self.env.deal()
-            self.dealer_hand.append(new_card)
-            dealer_score = hand_value(self.dealer_hand)
-            if self.verbose:
-                self.ui.show_dealer_action("draws", new_card, dealer_score)
+        # Stand on 17, unless the rules have the dealer hit a soft 17
+        hits_soft_17 = self.rules.dealer_hits_soft_17
+        while self.dealer_hand.total < 17 or (hits_soft_17 and self.dealer_hand.total == 17 and self.dealer_hand.is_soft):
+            self.dealer_hand.append(self.env.deal())
 
     def finalize_round(self, round_num: int) -> None:
         results = self.resolve_bets()
+        if self.hand_log is not None:
+            self.hand_log.record_round(self, results, round_num)
         self.process_payouts(results)
         self.remove_broke_agents(round_num)
 
     def resolve_bets(self) -> List[List[float]]:
-        dealer_score = hand_value(self.dealer_hand)
-        dealer_blackjack = len(self.dealer_hand) == 2 and dealer_score == 21
+        dealer_score = self.dealer_hand.total
+        dealer_blackjack = self.dealer_hand.is_blackjack
+        blackjack_payout = self.rules.blackjack_payout
         results = []
 
         for agent in self.agents:
             agent_results = []
             for hand in agent.hands:
-                player_score = hand_value(hand)
-                player_blackjack = len(hand) == 2 and player_score == 21
+                player_score = hand.total
+                player_blackjack = hand.is_blackjack
 
-                if player_score > 21:
+                if hand.surrendered:
+                    agent_results.append(-0.5)
+                elif player_score > 21:
                     agent_results.append(-1)
                 elif dealer_blackjack:
                     agent_results.append(0 if player_blackjack else -1)
                 elif player_blackjack:
-                    agent_results.append(1.5)
+                    agent_results.append(blackjack_payout)
                 elif dealer_score > 21 or player_score > dealer_score:
                     agent_results.append(1)
                 elif player_score < dealer_score:
@@ -102,14 +150,14 @@ class BlackjackGame:
     def process_payouts(self, results: List[List[float]]) -> None:
         for agent, agent_results in zip(self.agents, results):
             total_win = 0
-            for i, result in enumerate(agent_results):
-                bet = agent.hand_bets[i]
+            for hand, result in zip(agent.hands, agent_results):
+                bet = hand.bet
                 payout = round(bet * result)
                 total_win += payout
                 # Update per-hand stats
-                if result in (1, 1.5):
+                if result > 0:
                     agent.stats['wins'] += 1
-                elif result == -1:
+                elif result < 0:
                     agent.stats['losses'] += 1
                 else:
                     agent.stats['pushes'] += 1
@@ -118,8 +166,6 @@ class BlackjackGame:
             agent.stats['rounds_played'] += 1
             agent.stats['bankroll_history'].append(agent.bankroll)
             agent.adjust_bankroll(total_win)
-            if self.verbose:
-                self.ui.show_round_result(agent.id, agent_results, agent.hand_bets, agent.bankroll)
             agent.clear_bets()
 
     def remove_broke_agents(self, round_num: int) -> None:
@@ -127,37 +173,145 @@ class BlackjackGame:
         for agent in self.agents:
             if agent.bankroll <= 0:
                 agent.broke_round = round_num
-                if self.verbose:
-                    print(f"Player {agent.id} went broke in round {round_num}!")
                 self.dropped_agents.append(agent)
             else:
                 remaining.append(agent)
         self.agents = remaining
 
-    # game.py
-    def run_simulation(self, num_rounds: Optional[int] = None, sim_id: int = 0, save_data=False) -> None:
+    def play_round(self, round_num: int) -> None:
+        self.place_bets()
+        dealer_upcard = self.initialize_new_round()
+        self.play_agent_turns(dealer_upcard)
+        self.play_dealer_turn()
+        self.finalize_round(round_num)
+
+    def play_round_verbose(self, round_num: int) -> None:
+        """play_round, narrated on the console."""
+        print(f"\n======== Round {round_num} ========")
+        self.env.start_round()
+        print(f"True Count: {self.env.true_count:.2f}")
+        self.place_bets()
+        for agent in self.agents:
+            print(f"Player {agent.id} bets: ${agent.bet}")
+        dealer_upcard = self.initialize_new_round()
+        self.ui.show_dealer_upcard(dealer_upcard)
+        self.play_agent_turns_verbose(dealer_upcard)
+
+        print("\n--- Dealer's Turn ---")
+        self.play_dealer_turn()
+        # Replay the dealer's cards to show the running totals
+        cards = self.dealer_hand.cards
+        shown = Hand(cards[:2])
+        print(f"Dealer reveals: {cards[0]} (Total: {shown.total})")
+        for card in cards[2:]:
+            shown.append(card)
+            self.ui.show_dealer_action("draws", card, shown.total)
+
+        # Hands are cleared as bets are paid, so keep them for the results
+        settled = [(agent, agent.hands) for agent in self.agents]
+        dropped = len(self.dropped_agents)
+        results = self.resolve_bets()
+        if self.hand_log is not None:
+            self.hand_log.record_round(self, results, round_num)
+        self.process_payouts(results)
+        for (agent, hands), agent_results in zip(settled, results):
+            self.ui.show_round_result(agent.id, agent_results, hands, agent.bankroll)
+        self.remove_broke_agents(round_num)
+        for agent in self.dropped_agents[dropped:]:
+            print(f"Player {agent.id} went broke in round {round_num}!")
+
+    def play_round_timed(self, round_num: int) -> None:
+        """play_round with each phase's wall time added to self.instrumentation."""
+        clock = time.perf_counter
+        times = self.instrumentation.phase_times
+        t0 = clock()
+        self.place_bets()
+        t1 = clock()
+        dealer_upcard = self.initialize_new_round()
+        t2 = clock()
+        self.play_agent_turns(dealer_upcard)
+        t3 = clock()
+        self.play_dealer_turn()
+        t4 = clock()
+        self.finalize_round(round_num)
+        t5 = clock()
+        times['place_bets'] += t1 - t0
+        times['initialize_new_round'] += t2 - t1
+        times['play_agent_turns'] += t3 - t2
+        times['play_dealer_turn'] += t4 - t3
+        times['finalize_round'] += t5 - t4
+
+    def counter_snapshot(self) -> dict:
+        """Lifetime environment and agent counters, diffed by instrumented runs."""
+        agents = self.agents + self.dropped_agents
+        return {
+            'hands': sum(agent.stats['wins'] + agent.stats['losses'] + agent.stats['pushes'] for agent in agents),
+            # The shuffle made when the environment was built isn't a reshuffle
+            'reshuffles': self.env.shuffles - 1,
+            'cards_dealt': self.env.cards_dealt,
+            'recommend_calls': sum(agent.stats.get('recommend_calls', 0) for agent in agents),
+            'splits': sum(agent.stats.get('splits', 0) for agent in agents),
+            'doubles': sum(agent.stats.get('doubles', 0) for agent in agents),
+        }
+
+    def start_instrumented_run(self) -> tuple:
+        return self.counter_snapshot(), time.perf_counter()
+
+    def finish_instrumented_run(self, started: tuple, rounds: int) -> None:
+        """Adds the wall time and counter deltas since start_instrumented_run to self.instrumentation."""
+        before, start = started
+        self.instrumentation.wall_time += time.perf_counter() - start
+        for name, count in self.counter_snapshot().items():
+            self.instrumentation.counters[name] += count - before[name]
+        self.instrumentation.counters['rounds'] += rounds
+
+    def run_simulation(self, num_rounds: Optional[int] = None, sim_id: int = 0, save_data=False,
+                       sink: Optional[ResultSink] = None) -> None:
+        """
+        Plays num_rounds rounds (or until everyone is broke); with save_data,
+        writes result records to sink (default: appended to
+        strat_comparisons.csv). Only a verbose game prints anything.
+        """
+        # Pick the round function once, so neither verbosity nor disabled instrumentation costs anything per round
+        if self.verbose:
+            play_round = self.play_round_verbose
+        elif self.instrumentation is None:
+            play_round = self.play_round
+        else:
+            play_round = self.play_round_timed
+        if self.instrumentation is not None:
+            started = self.start_instrumented_run()
+        # Only a human at a verbose table gets to pause between rounds
+        pause = self.verbose and any(isinstance(agent, HumanAgent) for agent in self.agents)
         round_num = 1
         while (num_rounds is None or round_num <= num_rounds) and self.agents:
-            if self.verbose:
-                print(f"\n======== Round {round_num} ========")
-            self.place_bets()
-            dealer_upcard = self.initialize_new_round()
-            if self.verbose:
-                self.ui.show_dealer_upcard(dealer_upcard)
-            self.play_agent_turns(dealer_upcard)
-            self.play_dealer_turn()
-            self.finalize_round(round_num)
+            play_round(round_num)
             round_num += 1
-            if self.verbose and any(isinstance(agent, HumanAgent) for agent in self.agents):
+            if pause and any(isinstance(agent, HumanAgent) for agent in self.agents):
                 stuff = input("\nPress Enter to continue to the next round...")
                 if stuff.lower() == "quit":
                     sys.exit()
+        if self.instrumentation is not None:
+            self.finish_instrumented_run(started, round_num - 1)
+        for agent in self.agents + self.dropped_agents:
+            # Streamed histories hold back a partial chunk
+            agent.stats['bankroll_history'].flush()
         if self.verbose:
-            print("\n======== Game Summary ========")
-            for agent in self.dropped_agents:
-                print(f"Player {agent.id} went broke in round {agent.broke_round}.")
-            for agent in self.agents:
-                print(f"Player {agent.id} finished with bankroll: ${agent.bankroll:.2f}")
+            self.print_summary()
+
+        if save_data:
+            if sink is None:
+                with CsvSink() as csv_sink:
+                    csv_sink.write(self.result_records(num_rounds, sim_id))
+            else:
+                sink.write(self.result_records(num_rounds, sim_id))
+
+    def print_summary(self) -> None:
+        print("\n======== Game Summary ========")
+        for agent in self.dropped_agents:
+            print(f"Player {agent.id} went broke in round {agent.broke_round}.")
+        for agent in self.agents:
+            print(f"Player {agent.id} finished with bankroll: ${agent.bankroll:.2f}")
 
         # Print statistics
         print("\n======== Statistics ========")
@@ -179,51 +333,349 @@ class BlackjackGame:
             print(f"  Avg Profit/Round: ${avg_profit:.2f}")
             print(f"  Final Bankroll: ${agent.bankroll:.2f}\n")
 
-        if save_data:
-            # Write to CSV with append mode and conditional header
-            filename = "strat_comparisons.csv"
-            header_exists = os.path.exists(filename) and os.stat(filename).st_size > 0
-
-            with open(filename, "a", newline="") as f:
-                # Write header only if file is new/empty
-                if not header_exists:
-                    f.write(
-                        "Sim ID,Sample,Agent ID,Strategy,Wins,Losses,Pushes,Total Profit,Avg Profit/Round,Final Bankroll\n")
-
-                # Write data rows for all agents
-                for agent in all_agents:
-                    total_hands = agent.stats['wins'] + agent.stats['losses'] + agent.stats['pushes']
-                    if total_hands == 0:
-                        continue
-
-                    avg_profit = agent.stats['total_profit'] / agent.stats['rounds_played'] if agent.stats[
-                        'rounds_played'] else 0
-
-                    # Get strategy type (placeholder for future implementation)
-                    strategy = getattr(agent, "strategy", "basic")
-
-                    f.write(
-                        f"{sim_id},"
-                        f"{num_rounds},"  # Sample size
-                        f"{agent.id},"
-                        f"{strategy},"
-                        f"{agent.stats['wins']},"
-                        f"{agent.stats['losses']},"
-                        f"{agent.stats['pushes']},"
-                        f"{agent.stats['total_profit']:.2f},"
-                        f"{avg_profit:.2f},"
-                        f"{agent.bankroll:.2f}\n"
-                    )
-
-
-def simulate_games(num_sims: int, rounds_per: int) -> None:
-    for sim_id in range(num_sims):
-        env = BlackjackEnvironment()
-        agents = [BlackjackAgent(strategy='unskilled'), BlackjackAgent(strategy='basic'),
-                  BlackjackAgent(strategy='counting')]
-        game = BlackjackGame(env, agents)
+    def result_rows(self, num_rounds: Optional[int], sim_id: int = 0) -> List[str]:
+        """One strat_comparisons.csv row per agent that played at least one hand."""
+        return [format_csv_row(record) for record in self.result_records(num_rounds, sim_id)]
+
+    def result_records(self, num_rounds: Optional[int], sim_id: int = 0) -> List[Record]:
+        """One result record per agent that played at least one hand (see results.RESULT_COLUMNS)."""
+        records = []
+        for agent in self.agents + self.dropped_agents:
+            total_hands = agent.stats['wins'] + agent.stats['losses'] + agent.stats['pushes']
+            if total_hands == 0:
+                continue
+
+            avg_profit = agent.stats['total_profit'] / agent.stats['rounds_played'] if agent.stats[
+                'rounds_played'] else 0
+
+            # Strategy label, e.g. "counting:zen" for a counter on another system than Hi-Lo
+            strategy = getattr(agent, "label", "basic")
+
+            records.append((
+                sim_id,
+                num_rounds,  # Sample size
+                agent.id,
+                strategy,
+                agent.stats['wins'],
+                agent.stats['losses'],
+                agent.stats['pushes'],
+                agent.stats['total_profit'],
+                avg_profit,
+                agent.bankroll,
+            ))
+        return records
+
+
+def sim_rng(seed: int, sim_id: int, backend: str = 'random'):
+    """
+    Independent, reproducible RNG stream for one sim, derived from the
+    master seed. backend is one of RNG_BACKENDS: a random.Random, or a
+    numpy Generator on the sim_id-th spawned child of the seed's
+    SeedSequence (what SeedSequence(seed).spawn would give), whose tables
+    deal pre-shuffled shoes.
+    """
+    if backend == 'random':
+        return random.Random(f"{seed}:{sim_id}")
+    if backend not in RNG_BACKENDS:
+        raise ValueError(f"Unknown RNG backend: {backend}")
+    import numpy as np
+    bit_generator = np.random.PCG64 if backend == 'pcg64' else np.random.Philox
+    return np.random.Generator(bit_generator(np.random.SeedSequence(seed, spawn_key=(sim_id,))))
+
+
+def sim_agents(count_systems: Tuple[str, ...] = ('hi_lo',), first_id: int = 1) -> List[BlackjackAgent]:
+    """
+    The seats of a sim: an unskilled and a basic agent, then a counting agent
+    per counting system, numbered from first_id. Records only need the final
+    bankroll, so no bankroll history is kept.
+    """
+    agents = [BlackjackAgent(strategy='unskilled', history='off'), BlackjackAgent(strategy='basic', history='off'),
+              *[BlackjackAgent(strategy='counting', count_system=system, history='off') for system in count_systems]]
+    for offset, agent in enumerate(agents):
+        agent.id = first_id + offset
+    return agents
+
+
+def run_one_sim(sim_id: int, rounds_per: int, seed: int, instrument: bool = False,
+                count_systems: Tuple[str, ...] = ('hi_lo',), hand_log: bool = False,
+                rng: str = 'random') -> Tuple[List[Record], Optional[dict], Optional[bytes]]:
+    """
+    Plays one seeded sim and returns its result records, plus its
+    instrumentation as a dict when instrument is set and its hand log
+    entries as bytes when hand_log is set. Safe to run in a worker process.
+    """
+    env = BlackjackEnvironment(rng=sim_rng(seed, sim_id, rng))
+    # Agent IDs follow sim_id so output doesn't depend on which process ran the sim
+    agents = sim_agents(count_systems, sim_id * (2 + len(count_systems)) + 1)
+    game = BlackjackGame(env, agents)
+    game.set_verbose(False)
+    if instrument:
+        game.enable_instrumentation()
+    if hand_log:
+        game.enable_hand_log(sim_id)
+    game.run_simulation(rounds_per, sim_id=sim_id)
+    stats = game.instrumentation.to_dict() if instrument else None
+    log = game.hand_log.to_array().tobytes() if hand_log else None
+    return game.result_records(rounds_per, sim_id), stats, log
+
+
+def run_paired_sim(sim_id: int, rounds_per: int, seed: int, instrument: bool = False,
+                   count_systems: Tuple[str, ...] = ('hi_lo',), hand_log: bool = False,
+                   rng: str = 'random') -> Tuple[List[Record], Optional[dict], Optional[bytes]]:
+    """
+    run_one_sim with common random numbers: each strategy sits alone at its
+    own table, and the tables play in lockstep from the same shuffle stream.
+    After every round, tables that used fewer cards burn the difference face
+    up (as if dealt to other seats), so every table starts each round on the
+    same card with the same count. Differences between the strategies'
+    results then come from their decisions rather than the cards.
+    """
+    games = []
+    for agent in sim_agents(count_systems, sim_id * (2 + len(count_systems)) + 1):
+        game = BlackjackGame(BlackjackEnvironment(rng=sim_rng(seed, sim_id, rng)), [agent])
         game.set_verbose(False)
-        game.run_simulation(rounds_per, sim_id=sim_id, save_data=True)
+        if instrument:
+            game.enable_instrumentation()
+        if hand_log:
+            game.enable_hand_log(sim_id)
+        games.append(game)
+    started = [game.start_instrumented_run() for game in games] if instrument else None
+    rounds = [0] * len(games)
+
+    for round_num in range(1, rounds_per + 1):
+        active = [i for i, game in enumerate(games) if game.agents]
+        if not active:
+            break
+        for i in active:
+            game = games[i]
+            if instrument:
+                game.play_round_timed(round_num)
+            else:
+                game.play_round(round_num)
+            rounds[i] += 1
+        cursor = min(games[i].env.cursor for i in active)
+        for i in active:
+            env = games[i].env
+            while env.cursor > cursor:
+                env.deal()
+
+    records = []
+    totals = Instrumentation()
+    for game, game_rounds, game_started in zip(games, rounds, started or [None] * len(games)):
+        records.extend(game.result_records(rounds_per, sim_id))
+        if instrument:
+            game.finish_instrumented_run(game_started, game_rounds)
+            totals.merge(game.instrumentation)
+    log = b"".join(game.hand_log.to_array().tobytes() for game in games) if hand_log else None
+    return records, totals.to_dict() if instrument else None, log
+
+
+def sim_results(run_sim, sim_ids: range, rounds_per: int, seed: int, instrument: bool = False,
+                pool: Optional[ProcessPoolExecutor] = None, chunksize: int = 16):
+    """Yields run_sim's (records, instrumentation, hand log) for each sim in sim_id order, on pool if given."""
+    if pool is None:
+        return (run_sim(sim_id, rounds_per, seed, instrument) for sim_id in sim_ids)
+    # map yields in submission order, so records come back sorted by sim_id
+    count = len(sim_ids)
+    return pool.map(run_sim, sim_ids, [rounds_per] * count, [seed] * count, [instrument] * count,
+                    chunksize=chunksize)
+
+
+def simulate_games(num_sims: int, rounds_per: int, vectorized: bool = False, seed: Optional[int] = None,
+                   workers: int = 1, chunksize: int = 16, filename: str = "strat_comparisons.csv",
+                   sink: Optional[ResultSink] = None, instrumentation_file: Optional[str] = None,
+                   paired: bool = False, checkpoint: Optional[str] = None, checkpoint_every: int = 100,
+                   count_systems: Tuple[str, ...] = ('hi_lo',), hand_log_file: Optional[str] = None,
+                   rng: str = 'random') -> None:
+    """
+    Runs num_sims independent sims and writes their records to sink (default:
+    appended to the CSV filename) in sim_id order. Each sim shuffles from its
+    own stream derived from seed and sim_id, so the output for a given seed
+    is the same whatever the worker count. With instrumentation_file, every
+    sim is instrumented and the merged timings and counters are written
+    there as JSON (not available for the vectorized engine).
+    With paired, each sim replays the same shoes once per strategy (see
+    run_paired_sim); compare the results with aggregate.paired_comparison.
+    count_systems seats one counting agent per counting system, so several
+    systems are compared in the same run (labelled e.g. "counting:zen").
+    With hand_log_file, every agent's settled rounds are appended to that
+    file as a binary hand log (see hand_log.py) for replaying other bets.
+    rng picks the shuffle source (RNG_BACKENDS, see sim_rng) for the Python
+    engine.
+
+    With checkpoint, progress is saved to that JSON file every
+    checkpoint_every sims: the sims completed, the seed, where the output
+    ended and the running aggregates. Rerunning the same call after an
+    interruption truncates the output back to the last checkpoint and
+    carries on from there, giving the same output as an uninterrupted run.
+    The finished checkpoint holds the run's ResultsAggregator state.
+    """
+    if vectorized and paired:
+        raise ValueError("Paired mode needs the Python engine")
+    if vectorized and tuple(count_systems) != ('hi_lo',):
+        raise ValueError("The vectorized engine only counts Hi-Lo")
+    if vectorized and checkpoint:
+        raise ValueError("Checkpoints need the Python engine")
+    if vectorized and hand_log_file:
+        raise ValueError("Hand logs need the Python engine")
+    if vectorized and instrumentation_file:
+        raise ValueError("Instrumentation needs the Python engine")
+    if vectorized and rng != 'random':
+        raise ValueError("The vectorized engine shuffles with its own NumPy generator; rng needs the Python engine")
+    if rng not in RNG_BACKENDS:
+        raise ValueError(f"Unknown RNG backend: {rng}")
+    owns_sink = sink is None
+    if owns_sink:
+        sink = CsvSink(filename)
+    try:
+        if vectorized:
+            # NumPy batch engine: same rules and records, all sims played together
+            from batch_sim import simulate_games_batch
+            simulate_games_batch(num_sims, rounds_per, seed=seed, sink=sink)
+            return
+
+        run_sim = partial(run_paired_sim if paired else run_one_sim, count_systems=tuple(count_systems),
+                          hand_log=hand_log_file is not None, rng=rng)
+        instrument = instrumentation_file is not None
+        totals = Instrumentation()
+        aggregator = ResultsAggregator() if checkpoint else None
+        first = 0
+        state = load_checkpoint(checkpoint) if checkpoint else None
+        if state is not None:
+            # Checkpoints from before the rng option shuffled with random.Random, those from
+            # before count_systems seated Hi-Lo only, and those from before hand logs kept none
+            state.setdefault("rng", "random")
+            state.setdefault("count_systems", ["hi_lo"])
+            state.setdefault("hand_log_position", 0)
+            for name, value in (("num_sims", num_sims), ("rounds_per", rounds_per), ("paired", paired),
+                                ("count_systems", list(count_systems)), ("rng", rng)):
+                if state[name] != value:
+                    raise ValueError(f"Checkpoint {checkpoint} is for {name}={state[name]}, not {value}")
+            if seed is not None and seed != state["seed"]:
+                raise ValueError(f"Checkpoint {checkpoint} is for seed={state['seed']}, not {seed}")
+            seed = state["seed"]
+            first = state["completed"]
+            sink.truncate(state["position"])
+            if hand_log_file:
+                truncate_hand_log(hand_log_file, state["hand_log_position"])
+            aggregator = ResultsAggregator.from_dict(state["aggregate"])
+            totals = Instrumentation.from_dict(state["instrumentation"])
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+
+        # Opened after any truncation back to the checkpoint, and kept open for the whole run
+        log_file = open(hand_log_file, "ab") if hand_log_file else None
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            completed = first
+            for records, stats, log in sim_results(run_sim, range(first, num_sims), rounds_per, seed,
+                                                   instrument, pool, chunksize):
+                sink.write(records)
+                if log is not None:
+                    log_file.write(log)
+                if stats is not None:
+                    totals.merge(Instrumentation.from_dict(stats))
+                completed += 1
+                if checkpoint:
+                    aggregator.write(records)
+                    if completed % checkpoint_every == 0 or completed == num_sims:
+                        sink.flush()
+                        if log_file is not None:
+                            log_file.flush()
+                        save_checkpoint(checkpoint, {
+                            "num_sims": num_sims, "rounds_per": rounds_per, "paired": paired,
+                            "count_systems": list(count_systems), "rng": rng, "seed": seed,
+                            "completed": completed, "position": sink.position(),
+                            "hand_log_position": hand_log_position(hand_log_file) if hand_log_file else 0,
+                            "aggregate": aggregator.to_dict(), "instrumentation": totals.to_dict(),
+                        })
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if log_file is not None:
+                log_file.close()
+        if instrument:
+            totals.save(instrumentation_file)
+    finally:
+        if owns_sink:
+            sink.close()
+        else:
+            sink.flush()
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    """The state saved by simulate_games(checkpoint=path), or None if there is none yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    # Written aside and renamed, so an interruption never leaves half a checkpoint
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def simulate_until(target: float = 0.02, target_on: str = "strategy", rounds_per: int = 2000,
+                   batch_sims: int = 100, min_sims: int = 30, max_sims: Optional[int] = None,
+                   max_hands: Optional[int] = None, max_seconds: Optional[float] = None, paired: bool = False,
+                   seed: Optional[int] = None, workers: int = 1, chunksize: int = 16,
+                   filename: str = "strat_comparisons.csv", sink: Optional[ResultSink] = None,
+                   count_systems: Tuple[str, ...] = ('hi_lo',), rng: str = 'random') -> dict:
+    """
+    Runs sims in batches of batch_sims until the 95% confidence interval on
+    every tracked mean profit per round is within +/-target: each
+    strategy's (target_on "strategy") or each pairwise difference's
+    ("difference"; pair with paired=True for much tighter differences).
+    Stops early once max_sims, max_hands or max_seconds is reached. Records
+    go to sink as in simulate_games, and the same seed (and rng backend)
+    gives the same sims, so a run is a prefix of a longer one. Returns why it stopped, the
+    sims and hands played, elapsed seconds and the final half-widths.
+    """
+    if target_on not in ("strategy", "difference"):
+        raise ValueError(f"Unknown precision target: {target_on}")
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    owns_sink = sink is None
+    if owns_sink:
+        sink = CsvSink(filename)
+    tracker = ResultsAggregator() if target_on == "strategy" else PairedComparison()
+    run_sim = partial(run_paired_sim if paired else run_one_sim, count_systems=tuple(count_systems), rng=rng)
+    hands_col = [COLUMN_NAMES.index(name) for name in ("wins", "losses", "pushes")]
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    start = time.perf_counter()
+    sims = hands = 0
+    stopped = None
+    try:
+        while stopped is None:
+            batch = batch_sims if max_sims is None else min(batch_sims, max_sims - sims)
+            for records, _, _ in sim_results(run_sim, range(sims, sims + batch), rounds_per, seed,
+                                          pool=pool, chunksize=chunksize):
+                sink.write(records)
+                tracker.write(records)
+                hands += sum(record[col] for record in records for col in hands_col)
+            sims += batch
+            half_widths = tracker.half_widths()
+            if sims >= min_sims and half_widths and max(half_widths.values()) <= target:
+                stopped = "target"
+            elif max_sims is not None and sims >= max_sims:
+                stopped = "max_sims"
+            elif max_hands is not None and hands >= max_hands:
+                stopped = "max_hands"
+            elif max_seconds is not None and time.perf_counter() - start >= max_seconds:
+                stopped = "max_seconds"
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if owns_sink:
+            sink.close()
+        else:
+            sink.flush()
+    return {'stopped': stopped, 'sims': sims, 'hands': hands, 'seconds': time.perf_counter() - start,
+            'half_widths': half_widths}
 
 
 def play_game(num_rounds: int, num_agents: int) -> None:
@@ -235,7 +687,8 @@ def play_game(num_rounds: int, num_agents: int) -> None:
 
 def main():
     print("Blackjack Game")
-    choice = input("Choose mode (0=Play, 1=One sim, 2=Multiple sims): ")
+    choice = input("Choose mode (0=Play, 1=One sim, 2=Multiple sims, 3=Multiple sims (vectorized), "
+                   "4=Multiple sims (paired strategies), 5=Multiple sims (until +/-0.02 CI)): ")
 
     if choice == "0":
         env = BlackjackEnvironment()
@@ -247,8 +700,20 @@ def main():
         agents = [BlackjackAgent(strategy='unskilled'), BlackjackAgent(strategy='basic'), BlackjackAgent(strategy='counting')]
         game = BlackjackGame(env, agents)
         game.run_simulation(num_rounds=10)
+    elif choice == "3":
+        simulate_games(4000, 2000, vectorized=True)
+    elif choice == "4":
+        # Common shoes cancel most of the card luck, so far fewer sims give the same confidence
+        simulate_games(500, 2000, workers=os.cpu_count() or 1, paired=True)
+    elif choice == "5":
+        # Stop once every paired difference is pinned to +/-$0.02 a round, or after an hour
+        run = simulate_until(0.02, target_on="difference", paired=True, max_sims=4000, max_seconds=3600,
+                             workers=os.cpu_count() or 1)
+        print(f"Stopped on {run['stopped']} after {run['sims']} sims ({run['hands']} hands, {run['seconds']:.0f}s)")
+        for name, half_width in run['half_widths'].items():
+            print(f"  {name}: +/-{half_width:.4f} per round")
     else:
-        simulate_games(4000, 2000)
+        simulate_games(4000, 2000, workers=os.cpu_count() or 1)
 
 
 if __name__ == "__main__":
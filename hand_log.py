@@ -0,0 +1,203 @@
+"""
+Compact per-round outcome log, and bet-ramp replay from it.
+
+With a HandLog enabled, each settled round of each agent is recorded as one
+fixed-width entry (HAND_LOG_FIELDS, 24 bytes): sim and agent id, shoe number,
+round, the true count the agent bet on, and the round's net outcome in units
+of that bet (blackjack 1.5, a won double 2, split hands summed). Logs are
+raw binary files of such entries, appended in sim order and memory-mapped
+back by load_hand_log.
+
+Card play doesn't depend on the bet, so replay can apply any other betting
+function and starting bankroll to a log with NumPy, without dealing a card.
+Two things are approximate: a split or double the agent could afford in the
+log might not be affordable at the replayed bankroll, and profits are bet *
+units without the per-hand rounding of 3:2 payouts. NumPy is only needed to
+write and replay logs.
+"""
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# (field, dtype)
+HAND_LOG_FIELDS = (
+    ("sim_id", "<i4"),
+    ("agent_id", "<i4"),
+    ("shoe", "<i4"),  # Shuffles of the table's shoe so far, 1 for the first shoe
+    ("round", "<i4"),
+    ("true_count", "<f4"),  # At bet time, by the agent's counting system
+    ("units", "<f4"),  # Net outcome per unit of the initial bet
+)
+
+
+def hand_log_dtype():
+    import numpy as np
+    return np.dtype(list(HAND_LOG_FIELDS))
+
+
+class HandLog:
+    """Collects one sim's log entries in memory; to_array/append_to turn them into the binary format."""
+
+    def __init__(self, sim_id: int = 0) -> None:
+        self.sim_id = sim_id
+        self.entries: List[Tuple] = []
+        # Agent id -> true count of the current round's bet
+        self.bet_counts: Dict[int, float] = {}
+
+    def record_round(self, game, results: List[List[float]], round_num: int) -> None:
+        """Logs the settled round of each seated agent; results as from game.resolve_bets()."""
+        shoe = game.env.shuffles
+        for agent, agent_results in zip(game.agents, results):
+            if not agent.bet:
+                continue
+            won = sum(hand.bet * result for hand, result in zip(agent.hands, agent_results))
+            self.entries.append((self.sim_id, agent.id, shoe, round_num, self.bet_counts[agent.id],
+                                 won / agent.bet))
+
+    def to_array(self):
+        import numpy as np
+        return np.array(self.entries, dtype=hand_log_dtype())
+
+    def append_to(self, path: str) -> None:
+        append_hand_log(path, self.to_array())
+
+
+def append_hand_log(path: str, entries) -> None:
+    """Appends an array of hand_log_dtype() entries to the log file at path."""
+    with open(path, "ab") as f:
+        f.write(entries.tobytes())
+
+
+def hand_log_position(path: str) -> int:
+    """Bytes written to the log at path so far (for checkpoints)."""
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def truncate_hand_log(path: str, position: int) -> None:
+    if os.path.exists(path):
+        with open(path, "r+b") as f:
+            f.truncate(position)
+
+
+def load_hand_log(path: str, mmap: bool = True):
+    """The entries of a log file as a structured array, memory-mapped unless mmap is False."""
+    import numpy as np
+    if mmap and os.path.getsize(path) > 0:
+        return np.memmap(path, dtype=hand_log_dtype(), mode="r")
+    return np.fromfile(path, dtype=hand_log_dtype())
+
+
+def ramp_bet(ramp, base_bet: int = 30) -> Callable:
+    """A vectorized bet function (true counts, bankrolls) -> bets for a BetRamp, as BlackjackAgent.place_bet."""
+    def bet(true_count, bankroll):
+        return base_bet * ramp.multipliers(true_count, bankroll)
+    return bet
+
+
+def _streams(entries):
+    """Splits entries into per-(sim, agent) streams: (stream per entry, round index per entry, stream keys)."""
+    import numpy as np
+    keys = entries["sim_id"].astype(np.int64) << 32 | entries["agent_id"].astype(np.int64)
+    unique_keys, stream = np.unique(keys, return_inverse=True)
+    return stream, entries["round"].astype(np.int64) - 1, unique_keys
+
+
+def replay(entries, bet: Callable, bankroll: float = 10000, agent_ids: Optional[Sequence[int]] = None,
+           vectorized: bool = True, chunk_sims: int = 1000) -> dict:
+    """
+    Replays log entries with a different bet function and starting bankroll.
+    bet(true_count, bankroll) returns the bet; with vectorized it takes and
+    returns arrays (one element per stream), otherwise it's called per
+    element, like a place_bet. Each (sim, agent) stream is replayed round by
+    round, capping bets at the bankroll and stopping at ruin (bankroll <= 0).
+    Entries must be in sim order, as written; chunk_sims sims are replayed
+    at a time to bound memory.
+    Returns per-stream arrays: sim_id, agent_id, final_bankroll,
+    total_profit, rounds, max_drawdown and ruined.
+    """
+    import numpy as np
+    if not vectorized:
+        bet = np.vectorize(bet, otypes=[np.float64])
+    sim_ids = entries["sim_id"]
+    parts = []
+    if sim_ids.size:
+        for first in range(int(sim_ids[0]), int(sim_ids[-1]) + 1, chunk_sims):
+            start, stop = np.searchsorted(sim_ids, [first, first + chunk_sims])
+            block = np.asarray(entries[start:stop])
+            if agent_ids is not None:
+                block = block[np.isin(block["agent_id"], agent_ids)]
+            if block.size:
+                parts.append(_replay_block(block, bet, bankroll))
+    if not parts:
+        parts.append(_replay_block(np.zeros(0, dtype=hand_log_dtype()), bet, bankroll))
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def _replay_block(entries, bet: Callable, bankroll: float) -> dict:
+    import numpy as np
+    stream, position, keys = _streams(entries)
+    streams, rounds = keys.size, int(position.max()) + 1 if entries.size else 0
+    # Rounds as columns; streams that ended early are padded with no-ops
+    true_count = np.zeros((streams, rounds), dtype=np.float64)
+    units = np.zeros((streams, rounds), dtype=np.float64)
+    played = np.zeros((streams, rounds), dtype=bool)
+    true_count[stream, position] = entries["true_count"]
+    units[stream, position] = entries["units"]
+    played[stream, position] = True
+
+    money = np.full(streams, float(bankroll))
+    peak = money.copy()
+    max_drawdown = np.zeros(streams)
+    rounds_played = np.zeros(streams, dtype=np.int64)
+    for t in range(rounds):
+        live = played[:, t] & (money > 0)
+        if not live.any():
+            continue
+        wager = np.clip(np.minimum(bet(true_count[live, t], money[live]), money[live]), 0, None)
+        money[live] += wager * units[live, t]
+        rounds_played[live] += 1
+        np.maximum(peak, money, out=peak)
+        np.maximum(max_drawdown, peak - money, out=max_drawdown)
+    return {
+        'sim_id': (keys >> 32).astype(np.int64),
+        'agent_id': (keys & 0xFFFFFFFF).astype(np.int64),
+        'final_bankroll': money,
+        'total_profit': money - bankroll,
+        'rounds': rounds_played,
+        'max_drawdown': max_drawdown,
+        'ruined': money <= 0,
+    }
+
+
+def replay_summary(result: dict, ruin_bankroll: float = 1000) -> dict:
+    """Means over streams of a replay result, plus ruin rates (bust, and ending below ruin_bankroll)."""
+    import numpy as np
+    rounds = np.maximum(result['rounds'], 1)
+    return {
+        'streams': int(result['rounds'].size),
+        'mean_profit_per_round': float(np.mean(result['total_profit'] / rounds)),
+        'mean_final_bankroll': float(np.mean(result['final_bankroll'])),
+        'mean_max_drawdown': float(np.mean(result['max_drawdown'])),
+        'worst_drawdown': float(np.max(result['max_drawdown'], initial=0)),
+        'bust_rate': float(np.mean(result['ruined'])),
+        'ruin_rate': float(np.mean(result['final_bankroll'] < ruin_bankroll)),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import numpy as np
+    from agent import DEFAULT_BET_RAMP
+    parser = argparse.ArgumentParser(description="Replay a hand log with the default counting ramp and flat bets")
+    parser.add_argument("log", help="hand log written by simulate_games(hand_log_file=...)")
+    parser.add_argument("--bankroll", type=float, default=10000)
+    parser.add_argument("--base-bet", type=int, default=30)
+    parser.add_argument("--agents", type=int, nargs="*", help="only these agent ids")
+    args = parser.parse_args()
+    entries = load_hand_log(args.log)
+    bets = {
+        "counting ramp": ramp_bet(DEFAULT_BET_RAMP, args.base_bet),
+        "flat": lambda true_count, bankroll: np.full(true_count.shape, args.base_bet),
+    }
+    for name, bet in bets.items():
+        summary = replay_summary(replay(entries, bet, args.bankroll, args.agents))
+        print(f"{name}: " + ", ".join(f"{key} {value:.4g}" for key, value in summary.items()))
@@ -0,0 +1,153 @@
+"""
+Bankroll history recorders, kept in Agent.stats['bankroll_history'].
+
+    'off'       nothing is kept
+    'array'     every value, in a typed array('d') (8 bytes a round)
+    'decimate'  a fixed number of buckets, each holding the first, lowest,
+                highest and last value of a span of rounds; when they fill,
+                neighbours merge and spans double, so memory stays flat and
+                drawdowns stay accurate to a bucket
+
+Any recorder can also stream every value to a raw float64 file at path,
+written in chunks, for a full history on disk at flat memory. Call flush()
+(run_simulation does) before reading it back with read_history.
+"""
+from array import array
+from typing import List, Optional, Tuple, Union
+
+HISTORY_MODES = ('off', 'array', 'decimate')
+
+
+class BankrollHistory:
+    """Keeps nothing itself ('off'); streams to path if given."""
+
+    def __init__(self, path: Optional[str] = None, chunk: int = 65536) -> None:
+        self.path = path
+        self.chunk = chunk
+        self.count = 0
+        self.pending = array('d')
+        if path is not None:
+            # Start a fresh file; chunks are appended as they fill
+            open(path, "wb").close()
+
+    def append(self, value: float) -> None:
+        self.count += 1
+        self.record(value)
+        if self.path is not None:
+            self.pending.append(value)
+            if len(self.pending) >= self.chunk:
+                self.flush()
+
+    def record(self, value: float) -> None:
+        pass
+
+    def flush(self) -> None:
+        if self.path is not None and self.pending:
+            with open(self.path, "ab") as f:
+                self.pending.tofile(f)
+            self.pending = array('d')
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class ArrayHistory(BankrollHistory):
+    def __init__(self, path: Optional[str] = None, chunk: int = 65536) -> None:
+        super().__init__(path, chunk)
+        self.values = array('d')
+        if path is None:
+            # Nothing else to do per value, so skip the method call layers
+            self.append = self.values.append
+
+    def record(self, value: float) -> None:
+        self.values.append(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+
+class DecimatingHistory(BankrollHistory):
+    """
+    At most `buckets` buckets of `span` consecutive values each (span starts
+    at 1 and doubles whenever the buckets fill), keeping each bucket's first,
+    min, max and last value.
+    """
+
+    def __init__(self, buckets: int = 4096, path: Optional[str] = None, chunk: int = 65536) -> None:
+        super().__init__(path, chunk)
+        # Pairs merge on compaction, so keep an even count
+        self.buckets = max(2, buckets + buckets % 2)
+        self.span = 1
+        self.filled = 0  # Values in the last bucket
+        self.firsts = array('d')
+        self.mins = array('d')
+        self.maxs = array('d')
+        self.lasts = array('d')
+
+    def record(self, value: float) -> None:
+        if self.filled and self.filled < self.span:
+            self.filled += 1
+            if value < self.mins[-1]:
+                self.mins[-1] = value
+            if value > self.maxs[-1]:
+                self.maxs[-1] = value
+            self.lasts[-1] = value
+            return
+        if len(self.lasts) == self.buckets:
+            self._compact()
+        self.firsts.append(value)
+        self.mins.append(value)
+        self.maxs.append(value)
+        self.lasts.append(value)
+        self.filled = 1
+
+    def _compact(self) -> None:
+        """Merges neighbouring buckets pairwise, doubling the span."""
+        self.firsts = self.firsts[::2]
+        self.mins = array('d', map(min, self.mins[::2], self.mins[1::2]))
+        self.maxs = array('d', map(max, self.maxs[::2], self.maxs[1::2]))
+        self.lasts = self.lasts[1::2]
+        # Only ever called with every bucket full, so the merged ones are full too
+        self.span *= 2
+        self.filled = self.span
+
+    def bucket_rows(self) -> List[Tuple[int, float, float, float, float]]:
+        """(first round index, first, min, max, last) per bucket."""
+        return [(i * self.span, *values)
+                for i, values in enumerate(zip(self.firsts, self.mins, self.maxs, self.lasts))]
+
+    def max_drawdown(self) -> float:
+        """Largest fall from a running peak, resolved to a bucket (a bucket's min is taken after its max)."""
+        peak, drawdown = float("-inf"), 0.0
+        for high, low in zip(self.maxs, self.mins):
+            peak = max(peak, high)
+            drawdown = max(drawdown, peak - low)
+        return drawdown
+
+
+def make_history(mode: Union[str, BankrollHistory] = 'array', path: Optional[str] = None,
+                 buckets: int = 4096) -> BankrollHistory:
+    """A recorder for mode (one of HISTORY_MODES); a recorder passed as mode is returned as is."""
+    if isinstance(mode, BankrollHistory):
+        return mode
+    if mode == 'off':
+        return BankrollHistory(path)
+    if mode == 'array':
+        return ArrayHistory(path)
+    if mode == 'decimate':
+        return DecimatingHistory(buckets, path)
+    raise ValueError(f"Unknown history mode: {mode}")
+
+
+def read_history(path: str) -> array:
+    """Every value streamed to path, as an array('d')."""
+    values = array('d')
+    with open(path, "rb") as f:
+        values.frombytes(f.read())
+    return values
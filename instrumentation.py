@@ -0,0 +1,51 @@
+"""
+Opt-in timing and counters for BlackjackGame.run_simulation.
+
+Enable with game.enable_instrumentation(); run_simulation then plays rounds
+through a timed round function and fills game.instrumentation. With it
+disabled the plain round function runs and nothing is timed. Phase times
+are wall-clock seconds; counters are summed over every run (and, through
+merge, over every sim of simulate_games).
+"""
+import json
+from typing import Dict
+
+PHASES = ('place_bets', 'initialize_new_round', 'play_agent_turns', 'play_dealer_turn', 'finalize_round')
+COUNTERS = ('rounds', 'hands', 'reshuffles', 'cards_dealt', 'recommend_calls', 'splits', 'doubles')
+
+
+class Instrumentation:
+    def __init__(self) -> None:
+        self.phase_times: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.wall_time: float = 0.0
+
+    def merge(self, other: "Instrumentation") -> None:
+        for phase, seconds in other.phase_times.items():
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+        for name, count in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + count
+        self.wall_time += other.wall_time
+
+    def to_dict(self) -> dict:
+        rounds = self.counters['rounds']
+        return {
+            'wall_time': self.wall_time,
+            'phase_times': dict(self.phase_times),
+            'counters': dict(self.counters),
+            'hands_per_second': self.counters['hands'] / self.wall_time if self.wall_time else 0.0,
+            'microseconds_per_round': {phase: 1e6 * seconds / rounds if rounds else 0.0
+                                       for phase, seconds in self.phase_times.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "Instrumentation":
+        instrumentation = cls()
+        instrumentation.phase_times.update(state['phase_times'])
+        instrumentation.counters.update(state['counters'])
+        instrumentation.wall_time = state['wall_time']
+        return instrumentation
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
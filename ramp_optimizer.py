@@ -0,0 +1,249 @@
+"""
+Bet-ramp search for the counting strategy.
+
+Candidates are BetRamps, each scored by a lone counting agent playing the
+same seeded sims: sim k deals the same shoes whichever ramp is betting, so
+differences in score come from the ramps rather than the cards. Sims run
+on a pool of worker processes.
+
+grid_search scores every candidate on the full budget. successive_halving
+scores all of them on a few sims, keeps the best 1/eta, gives those eta
+times the sims, and so on, which spends most of the budget on the ramps
+still in contention.
+
+Candidates are ranked by an objective: EV (mean profit per round), a
+Kelly-style utility (mean log growth of the bankroll per round), risk of
+ruin (share of sims ending below RUIN_BANKROLL, EV breaking ties), or EV
+among the ramps whose risk of ruin is at most max_ruin ('ev_ruin'; the
+rest follow, least ruin first). All three measures are reported whichever
+objective ranks.
+
+    python ramp_optimizer.py --method halving --candidates 300 --sims 2000 --workers 8 -o ramps.json
+    python ramp_optimizer.py --objective ev_ruin --max-ruin 0.02
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from agent import DEFAULT_BET_RAMP, BetRamp, BlackjackAgent
+from aggregate import RUIN_BANKROLL, Z_95, RunningStats
+from environment import BlackjackEnvironment
+from game import BlackjackGame, sim_rng
+
+OBJECTIVES = ('ev', 'utility', 'ruin', 'ev_ruin')
+# Default cap on risk of ruin for the 'ev_ruin' objective
+MAX_RUIN = 0.05
+
+
+class RampScore:
+    """Per-sim results of one candidate, summarized."""
+
+    def __init__(self) -> None:
+        self.profit_per_round = RunningStats()
+        self.log_growth = RunningStats()
+        self.ruined = 0
+
+    @property
+    def sims(self) -> int:
+        return self.profit_per_round.count
+
+    def add(self, profit_per_round: float, log_growth: float, ruined: bool) -> None:
+        self.profit_per_round.add(profit_per_round)
+        self.log_growth.add(log_growth)
+        self.ruined += ruined
+
+    @property
+    def risk_of_ruin(self) -> float:
+        return self.ruined / self.sims if self.sims else 0.0
+
+    def value(self, objective: str, max_ruin: float = MAX_RUIN) -> tuple:
+        """Sort key for objective, higher is better."""
+        ev = self.profit_per_round.mean
+        if objective == 'ev':
+            return (ev,)
+        if objective == 'utility':
+            return (self.log_growth.mean,)
+        if objective == 'ruin':
+            return (-self.risk_of_ruin, ev)
+        if objective == 'ev_ruin':
+            within = self.risk_of_ruin <= max_ruin
+            return (within, ev if within else -self.risk_of_ruin)
+        raise ValueError(f"Unknown objective: {objective}")
+
+    def to_dict(self) -> dict:
+        ev = self.profit_per_round
+        return {
+            'sims': self.sims,
+            'ev': ev.mean,
+            'ev_ci95': Z_95 * ev.std / math.sqrt(ev.count) if ev.count > 1 else math.inf,
+            'risk_of_ruin': self.risk_of_ruin,
+            'utility': self.log_growth.mean,
+        }
+
+
+def play_ramp(ramp: BetRamp, sim_ids: range, rounds_per: int, seed: int, bankroll: int = 10000,
+              base_bet: int = 30, num_decks: int = 4) -> List[Tuple[float, float, bool]]:
+    """
+    (profit per round, log growth per round, ruined) of a counting agent betting
+    ramp, per sim. Only the final bankroll is scored, so no bankroll history is kept.
+    """
+    results = []
+    for sim_id in sim_ids:
+        agent = BlackjackAgent(bankroll, base_bet, strategy='counting', bet_ramp=ramp, history='off')
+        game = BlackjackGame(BlackjackEnvironment(num_decks, rng=sim_rng(seed, sim_id)), [agent])
+        game.set_verbose(False)
+        for round_num in range(1, rounds_per + 1):
+            if not game.agents:
+                break
+            game.play_round(round_num)
+        rounds = agent.stats['rounds_played']
+        profit = agent.stats['total_profit'] / rounds if rounds else 0.0
+        # A bust bankroll counts as $1 so the log stays finite
+        growth = math.log(max(agent.bankroll, 1) / bankroll) / rounds_per
+        results.append((profit, growth, agent.bankroll < RUIN_BANKROLL))
+    return results
+
+
+def _play_task(task: tuple) -> Tuple[int, List[Tuple[float, float, bool]]]:
+    index, ramp, start, stop, rounds_per, seed = task
+    return index, play_ramp(ramp, range(start, stop), rounds_per, seed)
+
+
+def score_candidates(candidates: Sequence[BetRamp], scores: List[RampScore], indices: Sequence[int],
+                     sims: int, rounds_per: int, seed: int, pool: Optional[ProcessPoolExecutor] = None,
+                     block: int = 25) -> None:
+    """Plays each indexed candidate on sims up to sims it hasn't played yet, in blocks of sims per task."""
+    tasks = [(i, candidates[i], start, min(start + block, sims), rounds_per, seed)
+             for i in indices for start in range(scores[i].sims, sims, block)]
+    results = pool.map(_play_task, tasks) if pool is not None else map(_play_task, tasks)
+    # Blocks come back in submission order, so each candidate's sims are added in sim order
+    for index, sim_results in results:
+        for result in sim_results:
+            scores[index].add(*result)
+
+
+def ranking(candidates: Sequence[BetRamp], scores: List[RampScore], objective: str = 'ev',
+            max_ruin: float = MAX_RUIN) -> List[dict]:
+    """Candidates best first: those scored on the most sims, then by objective."""
+    order = sorted(range(len(candidates)), key=lambda i: (scores[i].sims, *scores[i].value(objective, max_ruin)),
+                   reverse=True)
+    return [{'rank': rank, 'ramp': candidates[i].to_dict(), 'description': repr(candidates[i]),
+             **scores[i].to_dict()} for rank, i in enumerate(order, 1)]
+
+
+def grid_search(candidates: Sequence[BetRamp], sims: int, rounds_per: int = 2000, seed: int = 0,
+                objective: str = 'ev', workers: int = 1, max_ruin: float = MAX_RUIN) -> List[dict]:
+    """Scores every candidate on the same sims; returns the ranking."""
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    scores = [RampScore() for _ in candidates]
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        score_candidates(candidates, scores, range(len(candidates)), sims, rounds_per, seed, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return ranking(candidates, scores, objective, max_ruin)
+
+
+def successive_halving(candidates: Sequence[BetRamp], max_sims: int, min_sims: int = 30, eta: int = 3,
+                       rounds_per: int = 2000, seed: int = 0, objective: str = 'ev',
+                       workers: int = 1, max_ruin: float = MAX_RUIN) -> List[dict]:
+    """
+    Scores every candidate on min_sims sims, keeps the best 1/eta, and
+    repeats with eta times the sims until max_sims or a single survivor.
+    Survivors keep the sims they already played. Returns the ranking, in
+    which candidates eliminated later rank higher.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    scores = [RampScore() for _ in candidates]
+    survivors = list(range(len(candidates)))
+    sims = min(min_sims, max_sims)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while True:
+            score_candidates(candidates, scores, survivors, sims, rounds_per, seed, pool)
+            if len(survivors) <= 1 or sims >= max_sims:
+                break
+            survivors.sort(key=lambda i: scores[i].value(objective, max_ruin), reverse=True)
+            survivors = survivors[:max(1, len(survivors) // eta)]
+            sims = min(sims * eta, max_sims)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return ranking(candidates, scores, objective, max_ruin)
+
+
+def grid_ramps(starts: Sequence[float] = (0.5, 1, 1.5, 2), spacings: Sequence[float] = (1, 1.5, 2),
+               tops: Sequence[int] = (4, 8, 12), drawdowns: Sequence[Optional[float]] = (None, 5000),
+               steps: int = 4) -> List[BetRamp]:
+    """Linear ramps: steps thresholds from start, spacing apart, multipliers rising evenly from 1 to top."""
+    ramps = []
+    for start in starts:
+        for spacing in spacings:
+            for top in tops:
+                for drawdown in drawdowns:
+                    thresholds = [start + spacing * k for k in range(steps)]
+                    multipliers = [round(1 + (top - 1) * k / steps) for k in range(steps + 1)]
+                    ramps.append(BetRamp.from_thresholds(thresholds, multipliers, drawdown))
+    return ramps
+
+
+def random_ramps(count: int, seed: int = 0, max_multiplier: int = 12) -> List[BetRamp]:
+    """Random non-decreasing ramps with 2 to 5 thresholds between TC 0 and 8."""
+    rng = random.Random(seed)
+    ramps = []
+    for _ in range(count):
+        steps = rng.randint(2, 5)
+        thresholds = sorted(rng.sample([x / 2 for x in range(0, 17)], steps))
+        multipliers = sorted([1] + [rng.randint(1, max_multiplier) for _ in range(steps)])
+        drawdown = rng.choice((None, 2500, 5000, 7500))
+        ramps.append(BetRamp.from_thresholds(thresholds, multipliers, drawdown))
+    return ramps
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Search counting bet ramps")
+    parser.add_argument("--method", choices=("grid", "halving"), default="halving")
+    parser.add_argument("--candidates", type=int, default=0,
+                        help="random ramps to search (default: the linear grid from grid_ramps)")
+    parser.add_argument("--sims", type=int, default=1000, help="sims per candidate (max for halving)")
+    parser.add_argument("--min-sims", type=int, default=30, help="first-rung sims for halving")
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=2000, help="rounds per sim")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="ev")
+    parser.add_argument("--max-ruin", type=float, default=MAX_RUIN,
+                        help="highest risk of ruin a ramp may have to rank by EV (ev_ruin objective)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--top", type=int, default=10, help="rows to print")
+    parser.add_argument("-o", "--output", help="write the full ranking to this JSON file")
+    args = parser.parse_args(argv)
+
+    # The current ramp always competes, as the reference
+    candidates = [DEFAULT_BET_RAMP]
+    candidates += random_ramps(args.candidates, args.seed) if args.candidates else grid_ramps()
+    if args.method == "grid":
+        results = grid_search(candidates, args.sims, args.rounds, args.seed, args.objective, args.workers,
+                              args.max_ruin)
+    else:
+        results = successive_halving(candidates, args.sims, args.min_sims, args.eta, args.rounds, args.seed,
+                                     args.objective, args.workers, args.max_ruin)
+
+    for row in results[:args.top]:
+        print(f"{row['rank']:4d}  ev {row['ev']:+8.4f} (+/-{row['ev_ci95']:.4f})  ruin {row['risk_of_ruin']:6.1%}  "
+              f"utility {row['utility']:+.2e}  sims {row['sims']:5d}  {row['description']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
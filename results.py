@@ -0,0 +1,213 @@
+"""
+Result sinks for simulation output.
+
+A result record is one agent's line of strat_comparisons.csv as a tuple,
+in RESULT_COLUMNS order. Sinks buffer records in memory and write them out
+in chunks: CsvSink appends the familiar text rows, ColumnarSink writes
+typed column chunks (.npy, or Parquet when pandas and pyarrow are
+installed) that load_results can memory-map back without text parsing.
+NumPy is only needed for the columnar store.
+"""
+import glob
+import importlib.util
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# (CSV header, column name, dtype)
+RESULT_COLUMNS = (
+    ("Sim ID", "sim_id", "int64"),
+    ("Sample", "sample", "int64"),  # -1 when the sim ran without a round limit
+    ("Agent ID", "agent_id", "int64"),
+    ("Strategy", "strategy", "<U24"),  # e.g. "counting:hi_opt_ii"
+    ("Wins", "wins", "int64"),
+    ("Losses", "losses", "int64"),
+    ("Pushes", "pushes", "int64"),
+    ("Total Profit", "total_profit", "float64"),
+    ("Avg Profit/Round", "avg_profit", "float64"),
+    ("Final Bankroll", "final_bankroll", "float64"),
+)
+CSV_HEADER = ",".join(header for header, _, _ in RESULT_COLUMNS) + "\n"
+COLUMN_NAMES = tuple(name for _, name, _ in RESULT_COLUMNS)
+
+Record = Tuple
+
+
+def format_csv_row(record: Record) -> str:
+    sim_id, sample, agent_id, strategy, wins, losses, pushes, total_profit, avg_profit, bankroll = record
+    return (f"{sim_id},{sample},{agent_id},{strategy},{wins},{losses},{pushes},"
+            f"{total_profit:.2f},{avg_profit:.2f},{bankroll:.2f}\n")
+
+
+def parquet_available() -> bool:
+    return all(importlib.util.find_spec(module) is not None for module in ("pandas", "pyarrow"))
+
+
+class ResultSink(ABC):
+    """Buffers result records and writes them out chunk by chunk."""
+
+    def __init__(self, chunk_rows: int = 65536) -> None:
+        self.chunk_rows = chunk_rows
+        self.buffer: List[Record] = []
+
+    def write(self, records: Iterable[Record]) -> None:
+        self.buffer.extend(records)
+        if len(self.buffer) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.write_chunk(self.buffer)
+            self.buffer = []
+
+    @abstractmethod
+    def write_chunk(self, records: List[Record]) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    @abstractmethod
+    def position(self):
+        """
+        Marks the end of the flushed output, to truncate back to when resuming
+        an interrupted run. Saved in checkpoints, so it must round-trip through JSON.
+        """
+
+    @abstractmethod
+    def truncate(self, position) -> None:
+        """Drops output written after position (as from self.position()), including anything buffered."""
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class CsvSink(ResultSink):
+    """Appends records as strat_comparisons.csv text rows, writing the header only to a new/empty file."""
+
+    def __init__(self, filename: str = "strat_comparisons.csv", chunk_rows: int = 65536) -> None:
+        super().__init__(chunk_rows)
+        self.filename = filename
+
+    def write_chunk(self, records: List[Record]) -> None:
+        header_exists = os.path.exists(self.filename) and os.stat(self.filename).st_size > 0
+        with open(self.filename, "a", newline="") as f:
+            if not header_exists:
+                f.write(CSV_HEADER)
+            f.writelines(format_csv_row(record) for record in records)
+
+    def position(self) -> int:
+        return os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+
+    def truncate(self, position: int) -> None:
+        self.buffer = []
+        if os.path.exists(self.filename):
+            with open(self.filename, "r+") as f:
+                f.truncate(position)
+
+
+class ColumnarSink(ResultSink):
+    """
+    Writes each chunk of records as typed columns into the directory path:
+    part-NNNNN/<column>.npy (format "npy") or part-NNNNN.parquet (format
+    "parquet"). Parts are numbered after any already present, so repeated
+    runs append like the CSV does.
+    """
+
+    def __init__(self, path: str = "strat_comparisons", fmt: str = "npy", chunk_rows: int = 65536) -> None:
+        super().__init__(chunk_rows)
+        if fmt not in ("npy", "parquet"):
+            raise ValueError(f"Unknown results format: {fmt}")
+        if fmt == "parquet" and not parquet_available():
+            raise ValueError("Parquet output needs pandas and pyarrow installed")
+        self.path = path
+        self.fmt = fmt
+        os.makedirs(path, exist_ok=True)
+        self.next_part = len(_parts(path))
+
+    def write_chunk(self, records: List[Record]) -> None:
+        import numpy as np
+        columns = records_to_columns(records)
+        part = os.path.join(self.path, f"part-{self.next_part:05d}")
+        self.next_part += 1
+        if self.fmt == "parquet":
+            import pandas as pd
+            pd.DataFrame(columns).to_parquet(part + ".parquet", index=False)
+            return
+        os.makedirs(part)
+        for name, values in columns.items():
+            np.save(os.path.join(part, name + ".npy"), values)
+
+    def position(self) -> int:
+        return self.next_part
+
+    def truncate(self, position: int) -> None:
+        self.buffer = []
+        for part in _parts(self.path)[position:]:
+            if os.path.isdir(part):
+                shutil.rmtree(part)
+            else:
+                os.remove(part)
+        self.next_part = position
+
+
+def records_to_columns(records: List[Record]) -> dict:
+    import numpy as np
+    columns = {}
+    for i, (_, name, dtype) in enumerate(RESULT_COLUMNS):
+        values = [record[i] for record in records]
+        if name == "sample":
+            values = [-1 if value is None else value for value in values]
+        columns[name] = np.array(values, dtype=dtype)
+    return columns
+
+
+def _parts(path: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(path, "part-*")))
+
+
+def iter_result_chunks(path: str, mmap: bool = True) -> Iterator[dict]:
+    """Yields each part of a ColumnarSink store as {column name: array}, memory-mapped for .npy parts."""
+    import numpy as np
+    parts = _parts(path)
+    if not parts:
+        raise FileNotFoundError(f"No result parts in {path}")
+    for part in parts:
+        if part.endswith(".parquet"):
+            import pandas as pd
+            frame = pd.read_parquet(part)
+            yield {name: frame[name].to_numpy() for name in COLUMN_NAMES}
+        else:
+            yield {name: np.load(os.path.join(part, name + ".npy"), mmap_mode="r" if mmap else None)
+                   for name in COLUMN_NAMES}
+
+
+def load_results(path: str, mmap: bool = True) -> dict:
+    """
+    Loads a columnar store written by ColumnarSink as {column name: array}.
+    With mmap, .npy parts are memory-mapped; a store with a single part is
+    returned without copying.
+    """
+    import numpy as np
+    chunks = list(iter_result_chunks(path, mmap))
+    if len(chunks) == 1:
+        return chunks[0]
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMN_NAMES}
+
+
+def load_results_frame(path: str, mmap: bool = True):
+    """load_results as a pandas DataFrame with the strat_comparisons.csv column headers."""
+    import pandas as pd
+    columns = load_results(path, mmap)
+    return pd.DataFrame({header: columns[name] for header, name, _ in RESULT_COLUMNS})
+
+
+def open_sink(filename: str = "strat_comparisons.csv", fmt: Optional[str] = None) -> ResultSink:
+    """CsvSink for fmt None/"csv", else a ColumnarSink in a directory named after filename."""
+    if fmt in (None, "csv"):
+        return CsvSink(filename)
+    return ColumnarSink(os.path.splitext(filename)[0], fmt)
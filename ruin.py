@@ -0,0 +1,257 @@
+"""
+Risk-of-ruin estimates from a per-round outcome distribution.
+
+An OutcomeDistribution is the net result of a round in units of the bet,
+optionally paired with the true count the bet was placed on. It comes from
+a hand log (hand_log.py) of a simulation, or from an EV (ev.py) by tilting
+a typical basic-strategy outcome shape to that mean. A bet policy maps true
+counts and bankrolls to dollar bets.
+
+ruin_table draws i.i.d. rounds for many paths at once, takes cumulative
+sums of the dollar results (a block of rounds at a time), and reports for each starting bankroll and
+horizon the share of paths whose running minimum lost the whole bankroll,
+with a 95% Wilson interval and the Brownian-motion (diffusion)
+approximation alongside. Rounds are independent draws, so the count's
+drift through a shoe and the game's cap of bets at the bankroll are not
+modelled.
+
+    python ruin.py --ev -0.005 --bankrolls 1000 3000 10000 --horizons 1000 10000
+    python ruin.py --log hands.bin --agents 3 6 9 --ramp
+"""
+import argparse
+import math
+import sys
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from aggregate import Z_95
+
+# Net units per round and their frequencies for a basic-strategy agent, from a
+# 4-deck hand log (800k rounds, variance 1.30); -4 and 4 gather the tails
+BASIC_OUTCOMES = (
+    (-4.0, 0.00063), (-3.0, 0.00195), (-2.5, 0.00002), (-2.0, 0.03484), (-1.5, 0.00001), (-1.0, 0.44157),
+    (-0.5, 0.00026), (0.0, 0.08702), (0.5, 0.00064), (1.0, 0.33265), (1.5, 0.0459), (2.0, 0.0494),
+    (2.5, 0.00079), (3.0, 0.00289), (3.5, 0.00025), (4.0, 0.00119),
+)
+
+
+class OutcomeDistribution:
+    """Round outcomes in bet units with probabilities, each optionally with the true count at bet time."""
+
+    def __init__(self, units: Sequence[float], weights: Optional[Sequence[float]] = None,
+                 true_counts: Optional[Sequence[float]] = None) -> None:
+        self.units = np.asarray(units, dtype=np.float64)
+        weights = np.ones(self.units.size) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.probabilities = weights / weights.sum()
+        self.true_counts = (np.zeros(self.units.size) if true_counts is None
+                            else np.asarray(true_counts, dtype=np.float64))
+        self.cdf = np.cumsum(self.probabilities)
+
+    @classmethod
+    def from_hand_log(cls, entries, agent_ids: Optional[Sequence[int]] = None) -> "OutcomeDistribution":
+        """The empirical joint distribution of (true count, units) of a hand log's rounds."""
+        if agent_ids is not None:
+            entries = entries[np.isin(entries["agent_id"], agent_ids)]
+        return cls(entries["units"], true_counts=entries["true_count"])
+
+    @classmethod
+    def from_ev(cls, ev: float, shape: Sequence = BASIC_OUTCOMES) -> "OutcomeDistribution":
+        """
+        shape's outcomes, exponentially tilted so the mean is ev (as from
+        ev.strategy_ev): the closest distribution to shape with that mean.
+        """
+        units = np.array([value for value, _ in shape])
+        base = np.array([probability for _, probability in shape])
+        if not units.min() < ev < units.max():
+            raise ValueError(f"EV {ev} is outside the outcome range")
+        low, high = -10.0, 10.0
+        for _ in range(100):
+            theta = (low + high) / 2
+            tilted = base * np.exp(theta * units)
+            if tilted @ units / tilted.sum() < ev:
+                low = theta
+            else:
+                high = theta
+        return cls(units, base * np.exp(theta * units))
+
+    def dollar_moments(self, policy: Callable, bankroll: float = math.inf) -> tuple:
+        """Mean and variance of a round's dollar result under policy, betting at bankroll."""
+        dollars = policy(self.true_counts, bankroll) * self.units
+        mean = self.probabilities @ dollars
+        return float(mean), float(self.probabilities @ (dollars - mean) ** 2)
+
+    def sample(self, rng: np.random.Generator, shape: tuple) -> tuple:
+        """True counts and units of shape random rounds."""
+        index = np.minimum(np.searchsorted(self.cdf, rng.random(shape)), self.units.size - 1)
+        return self.true_counts[index], self.units[index]
+
+
+def flat_policy(base_bet: float = 30) -> Callable:
+    return lambda true_count, bankroll: np.full(np.shape(true_count), float(base_bet))
+
+
+def ramp_policy(ramp, base_bet: float = 30) -> Callable:
+    """A BetRamp's bets by true count and bankroll, as BlackjackAgent.place_bet (uncapped)."""
+    def policy(true_count, bankroll):
+        return base_bet * ramp.multipliers(true_count, bankroll)
+    # With a drawdown rule the bets follow each path's bankroll
+    policy.by_bankroll = ramp.drawdown_bankroll is not None
+    return policy
+
+
+def wilson_interval(hits: int, trials: int, z: float = Z_95) -> tuple:
+    if trials == 0:
+        return 0.0, 1.0
+    p = hits / trials
+    center = (p + z * z / (2 * trials)) / (1 + z * z / trials)
+    spread = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / (1 + z * z / trials)
+    return max(0.0, center - spread), min(1.0, center + spread)
+
+
+def _normal_cdf(x: float) -> float:
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+
+def _log_normal_cdf(x: float) -> float:
+    """log of the normal CDF, finite far into the lower tail where the CDF itself underflows."""
+    if x > -30:
+        return math.log(0.5 * math.erfc(-x / math.sqrt(2)))
+    # Asymptotic series of the Mills ratio
+    return -x * x / 2 - math.log(-x * math.sqrt(2 * math.pi)) + math.log1p(-1 / x ** 2 + 3 / x ** 4)
+
+
+def diffusion_ruin(bankroll: float, horizon: Optional[float], mean: float, variance: float) -> float:
+    """
+    Probability that Brownian motion with the given per-round drift and
+    variance falls by bankroll within horizon rounds (None: ever).
+    """
+    if variance <= 0:
+        return float(mean * (horizon or math.inf) <= -bankroll)
+    if horizon is None:
+        return 1.0 if mean <= 0 else math.exp(-2 * mean * bankroll / variance)
+    spread = math.sqrt(variance * horizon)
+    first = _normal_cdf((-bankroll - mean * horizon) / spread)
+    # The reflected term's exponential and normal tail can over- and underflow alone, so multiply in log space
+    exponent = -2 * mean * bankroll / variance
+    reflected = math.exp(min(exponent + _log_normal_cdf((-bankroll + mean * horizon) / spread), 0.0))
+    return min(1.0, first + reflected)
+
+
+def _lowest_totals(distribution: OutcomeDistribution, policy: Callable, rng: np.random.Generator,
+                   batch: int, horizons: Sequence[int], block_rounds: int,
+                   bankroll: Optional[float] = None) -> np.ndarray:
+    """
+    Lowest dollar total of batch random paths by each of the (sorted)
+    horizons, shape (batch, horizons). Given a starting bankroll, each
+    round is bet at the path's bankroll so far; otherwise the policy is
+    given no bankroll and every round of a block is bet at once.
+    """
+    lowest_at = np.empty((batch, len(horizons)))
+    total = np.zeros(batch)
+    lowest = np.full(batch, np.inf)
+    column = 0
+    for start in range(0, horizons[-1], block_rounds):
+        width = min(block_rounds, horizons[-1] - start)
+        if bankroll is None:
+            true_count, units = distribution.sample(rng, (batch, width))
+            path = np.cumsum(policy(true_count, None) * units, axis=1)
+            path += total[:, None]
+        else:
+            # Drawn a round per row, so each round's draws are contiguous
+            true_count, units = distribution.sample(rng, (width, batch))
+            path = np.empty((batch, width))
+            for k in range(width):
+                total = total + policy(true_count[k], bankroll + total) * units[k]
+                path[:, k] = total
+        running = np.minimum.accumulate(path, axis=1)
+        np.minimum(running, lowest[:, None], out=running)
+        while column < len(horizons) and horizons[column] <= start + width:
+            lowest_at[:, column] = running[:, horizons[column] - 1 - start]
+            column += 1
+        total, lowest = path[:, -1], running[:, -1]
+    return lowest_at
+
+
+def ruin_table(distribution: OutcomeDistribution, policy: Callable, bankrolls: Sequence[float],
+               horizons: Sequence[int], paths: int = 1_000_000, seed: Optional[int] = None,
+               batch_paths: int = 20000, block_rounds: int = 128) -> List[Dict[str, float]]:
+    """
+    Monte Carlo ruin probability for each (bankroll, horizon), with its
+    Wilson 95% interval and the diffusion estimate. Paths are simulated
+    batch_paths at a time, block_rounds rounds at a time up to the longest
+    horizon, carrying each path's total and running minimum from block to
+    block, so memory does not grow with the horizon. A policy that bets by
+    bankroll (policy.by_bankroll) is played round by round, on separate
+    paths for each starting bankroll; the diffusion estimate takes its bets
+    at the starting bankroll.
+    """
+    rng = np.random.default_rng(seed)
+    horizons = sorted(int(h) for h in horizons)
+    bankrolls = np.asarray(sorted(bankrolls), dtype=np.float64)
+    hits = np.zeros((bankrolls.size, len(horizons)), dtype=np.int64)
+    by_bankroll = getattr(policy, 'by_bankroll', False)
+    done = 0
+    while done < paths:
+        batch = min(batch_paths, paths - done)
+        if by_bankroll:
+            for i, bankroll in enumerate(bankrolls):
+                lowest = _lowest_totals(distribution, policy, rng, batch, horizons, block_rounds, bankroll)
+                hits[i] += (lowest <= -bankroll).sum(axis=0)
+        else:
+            lowest = _lowest_totals(distribution, policy, rng, batch, horizons, block_rounds)
+            hits += (lowest[None, :, :] <= -bankrolls[:, None, None]).sum(axis=1)
+        done += batch
+
+    rows = []
+    for i, bankroll in enumerate(bankrolls):
+        mean, variance = distribution.dollar_moments(policy, bankroll)
+        for j, horizon in enumerate(horizons):
+            low, high = wilson_interval(int(hits[i, j]), paths)
+            rows.append({
+                'bankroll': float(bankroll),
+                'horizon': horizon,
+                'ruin': hits[i, j] / paths,
+                'ci95_low': low,
+                'ci95_high': high,
+                'diffusion': diffusion_ruin(bankroll, horizon, mean, variance),
+            })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Risk of ruin by starting bankroll and horizon")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--log", help="hand log to draw rounds from (simulate_games(hand_log_file=...))")
+    source.add_argument("--ev", type=float, help="EV per round in units, e.g. from ev.strategy_ev()")
+    parser.add_argument("--agents", type=int, nargs="*", help="with --log, only these agent ids")
+    parser.add_argument("--ramp", action="store_true", help="bet the default counting ramp instead of flat")
+    parser.add_argument("--base-bet", type=float, default=30)
+    parser.add_argument("--bankrolls", type=float, nargs="+", default=[1000, 2000, 5000, 10000])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument("--paths", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    if args.log:
+        from hand_log import load_hand_log
+        distribution = OutcomeDistribution.from_hand_log(load_hand_log(args.log), args.agents)
+    else:
+        distribution = OutcomeDistribution.from_ev(args.ev)
+    if args.ramp:
+        from agent import DEFAULT_BET_RAMP
+        policy = ramp_policy(DEFAULT_BET_RAMP, args.base_bet)
+    else:
+        policy = flat_policy(args.base_bet)
+
+    mean, variance = distribution.dollar_moments(policy, args.bankrolls[0])
+    print(f"Per round at the first bankroll: mean ${mean:.3f}, sd ${math.sqrt(variance):.2f}; "
+          f"ruin ever (diffusion): {diffusion_ruin(args.bankrolls[0], None, mean, variance):.2%}")
+    for row in ruin_table(distribution, policy, args.bankrolls, args.horizons, args.paths, args.seed):
+        print(f"bankroll {row['bankroll']:>9,.0f}  horizon {row['horizon']:>7,}  ruin {row['ruin']:8.4%} "
+              f"[{row['ci95_low']:.4%}, {row['ci95_high']:.4%}]  diffusion {row['diffusion']:8.4%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
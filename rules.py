@@ -0,0 +1,82 @@
+"""
+Table rules.
+
+TableRules holds the rules a casino varies: the dealer hitting or standing
+on soft 17, the blackjack payout, doubling after a split, how many hands
+splitting may make, surrender, and the deck count. The defaults are
+the game's own rules: S17, 3:2, double after split, unlimited resplits, no
+surrender, 4 decks. The dealer never peeks, so a dealer blackjack beats
+every other hand at its full (doubled) bet.
+
+BlackjackGame plays by its rules and hands them to its agents, whose
+strategy tables come from strategy_tables.strategy_tables(rules).
+"""
+import hashlib
+import json
+from typing import Optional
+
+
+class TableRules:
+    def __init__(self, num_decks: int = 4, dealer_hits_soft_17: bool = False, blackjack_payout: float = 1.5,
+                 double_after_split: bool = True, max_split_hands: Optional[int] = None,
+                 surrender: bool = False) -> None:
+        if num_decks < 1:
+            raise ValueError(f"Need at least one deck, not {num_decks}")
+        if blackjack_payout <= 0:
+            raise ValueError(f"Blackjack payout must be positive, not {blackjack_payout}")
+        if max_split_hands is not None and max_split_hands < 1:
+            raise ValueError(f"max_split_hands must be at least 1 (no splitting), not {max_split_hands}")
+        self.num_decks = num_decks
+        self.dealer_hits_soft_17 = dealer_hits_soft_17
+        self.blackjack_payout = blackjack_payout
+        self.double_after_split = double_after_split
+        # Hands a player may hold after splitting, None for no limit
+        self.max_split_hands = max_split_hands
+        # Surrender of the first two cards (not after a split) for half the bet; with no peek,
+        # that includes hands the dealer's blackjack would have beaten
+        self.surrender = surrender
+
+    @property
+    def allows_split(self) -> bool:
+        return self.max_split_hands is None or self.max_split_hands > 1
+
+    def to_dict(self) -> dict:
+        return {
+            'num_decks': self.num_decks,
+            'dealer_hits_soft_17': self.dealer_hits_soft_17,
+            'blackjack_payout': self.blackjack_payout,
+            'double_after_split': self.double_after_split,
+            'max_split_hands': self.max_split_hands,
+            'surrender': self.surrender,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "TableRules":
+        return cls(**state)
+
+    def key(self) -> str:
+        """Short hash of the rules, naming their cached strategy tables."""
+        # Payouts hash by value, so 1.5 and 3/2 name the same tables
+        state = dict(self.to_dict(), blackjack_payout=float(self.blackjack_payout))
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _fields(self) -> tuple:
+        # Hashed on every lookup of the EV engine's caches, so skip to_dict
+        return (self.num_decks, self.dealer_hits_soft_17, self.blackjack_payout, self.double_after_split,
+                self.max_split_hands, self.surrender)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TableRules) and self._fields() == other._fields()
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __repr__(self) -> str:
+        payout = self.blackjack_payout
+        return (f"TableRules({self.num_decks} decks, {'H17' if self.dealer_hits_soft_17 else 'S17'}, "
+                f"blackjack pays {payout:g}, {'DAS' if self.double_after_split else 'no DAS'}, "
+                f"split to {self.max_split_hands or 'any'} hands"
+                f"{', surrender' if self.surrender else ''})")
+
+
+DEFAULT_RULES = TableRules()
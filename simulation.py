@@ -0,0 +1,255 @@
+"""
+Headless simulation API for embedding in batch jobs.
+
+    config = SimulationConfig(strategies=('basic', 'counting', 'counting:zen'), rounds=5000, sims=200, seed=1)
+    result = simulate(config)
+    for name, summary in result.summary().items():
+        print(name, summary['mean_profit_per_round'])
+
+simulate plays config.sims seeded sims of one table each, quietly: nothing
+is printed and nothing is written unless a ResultSink is passed, which
+gets each sim's result records as simulate_games would write them. Sim k
+deals the same shoes as sim k of simulate_games with the same seed.
+"""
+import math
+import numbers
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+from agent import COUNTING_STRATEGIES, STRATEGIES, Agent, BetRamp, BlackjackAgent
+from aggregate import Z_95, ResultsAggregator
+from environment import BlackjackEnvironment, check_count_system
+from game import RNG_BACKENDS, SIM_STRATEGIES, BlackjackGame, sim_rng
+from history import HISTORY_MODES, BankrollHistory
+from results import Record, ResultSink
+from rules import TableRules
+
+
+def parse_strategy(label: str) -> tuple:
+    """(strategy, counting system) of a result label such as 'basic' or 'counting:zen'."""
+    strategy, _, system = label.partition(":")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    if system and strategy not in COUNTING_STRATEGIES:
+        raise ValueError(f"Only the counting strategies take a counting system: {label}")
+    system = system or 'hi_lo'
+    check_count_system(system)
+    return strategy, system
+
+
+class SimulationConfig:
+    """
+    What to simulate: the table's seats by strategy label (one agent each,
+    'counting:<system>' for other counting systems than Hi-Lo, and
+    'rank_groups' for play by the rank groups left; see agent.STRATEGIES), their
+    starting bankrolls (one for all, or one per seat), the rounds per sim
+    (None: until every agent is broke), the number of sims and the seed.
+    penetration and continuous set up the shoe (see BlackjackEnvironment:
+    the fraction dealt before the cut card, or a continuous shuffler), and
+    rng picks the shuffle source (game.RNG_BACKENDS).
+    history is the agents' bankroll history mode (history.HISTORY_MODES).
+    rules are the table's (default: the game's own for num_decks, itself 4
+    by default); their deck count is the shoe's.
+    """
+
+    def __init__(self, num_decks: Optional[int] = None, strategies: Sequence[str] = SIM_STRATEGIES,
+                 bankroll: Union[float, Sequence[float]] = 10000, base_bet: int = 30, rounds: Optional[int] = 2000,
+                 sims: int = 1, seed: Optional[int] = None, bet_ramp: Optional[BetRamp] = None,
+                 history: str = 'off', penetration: Optional[float] = None, continuous: bool = False,
+                 rng: str = 'random', rules: Optional[TableRules] = None) -> None:
+        if rules is None:
+            rules = TableRules(num_decks=num_decks if num_decks is not None else 4)
+        elif num_decks is not None and num_decks != rules.num_decks:
+            raise ValueError(f"num_decks is {num_decks}, but the rules are for {rules.num_decks} decks")
+        self.rules = rules
+        self.num_decks = rules.num_decks
+        self.strategies = tuple(strategies)
+        self.bankrolls = ((bankroll,) * len(self.strategies) if isinstance(bankroll, numbers.Real)
+                          else tuple(bankroll))
+        self.base_bet = base_bet
+        self.rounds = rounds
+        self.sims = sims
+        self.seed = seed
+        self.bet_ramp = bet_ramp
+        self.history = history
+        self.penetration = penetration
+        self.continuous = continuous
+        self.rng = rng
+        self.validate()
+
+    def validate(self) -> None:
+        if self.num_decks < 1:
+            raise ValueError(f"Need at least one deck, not {self.num_decks}")
+        if not self.strategies:
+            raise ValueError("Need at least one strategy")
+        for label in self.strategies:
+            parse_strategy(label)
+        if len(self.bankrolls) != len(self.strategies):
+            raise ValueError(f"{len(self.bankrolls)} bankrolls for {len(self.strategies)} strategies")
+        if self.rounds is not None and self.rounds < 0:
+            raise ValueError(f"Rounds must not be negative, not {self.rounds}")
+        if self.sims < 1:
+            raise ValueError(f"Need at least one sim, not {self.sims}")
+        if self.history not in HISTORY_MODES:
+            raise ValueError(f"Unknown history mode: {self.history}")
+        if self.penetration is not None and not 0 < self.penetration < 1:
+            raise ValueError(f"Penetration must be between 0 and 1, not {self.penetration}")
+        if self.rng not in RNG_BACKENDS:
+            raise ValueError(f"Unknown RNG backend: {self.rng}")
+
+    def agents(self) -> List[BlackjackAgent]:
+        """Fresh agents for one sim's seats."""
+        agents = []
+        for label, bankroll in zip(self.strategies, self.bankrolls):
+            strategy, system = parse_strategy(label)
+            agents.append(BlackjackAgent(bankroll, self.base_bet, strategy, count_system=system,
+                                         bet_ramp=self.bet_ramp, history=self.history))
+        return agents
+
+    def to_dict(self) -> dict:
+        return {
+            'num_decks': self.num_decks,
+            'strategies': list(self.strategies),
+            'bankroll': list(self.bankrolls),
+            'base_bet': self.base_bet,
+            'rounds': self.rounds,
+            'sims': self.sims,
+            'seed': self.seed,
+            'bet_ramp': self.bet_ramp.to_dict() if self.bet_ramp is not None else None,
+            'history': self.history,
+            'penetration': self.penetration,
+            'continuous': self.continuous,
+            'rng': self.rng,
+            'rules': self.rules.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "SimulationConfig":
+        state = dict(state)
+        if state.get('bet_ramp') is not None:
+            state['bet_ramp'] = BetRamp.from_dict(state['bet_ramp'])
+        if state.get('rules') is not None:
+            state['rules'] = TableRules.from_dict(state['rules'])
+        return cls(**state)
+
+    def __repr__(self) -> str:
+        return f"SimulationConfig({', '.join(f'{key}={value!r}' for key, value in self.to_dict().items())})"
+
+
+class AgentResult:
+    """One agent's outcome in one sim."""
+
+    def __init__(self, sim_id: int, agent: Agent) -> None:
+        self.sim_id = sim_id
+        self.agent_id = agent.id
+        self.strategy: str = getattr(agent, "label", "basic")
+        self.wins: int = agent.stats['wins']
+        self.losses: int = agent.stats['losses']
+        self.pushes: int = agent.stats['pushes']
+        self.rounds_played: int = agent.stats['rounds_played']
+        self.total_profit: float = agent.stats['total_profit']
+        self.final_bankroll: float = agent.bankroll
+        self.broke_round: Optional[int] = agent.broke_round
+        self.history: BankrollHistory = agent.stats['bankroll_history']
+
+    @property
+    def hands(self) -> int:
+        return self.wins + self.losses + self.pushes
+
+    @property
+    def avg_profit(self) -> float:
+        return self.total_profit / self.rounds_played if self.rounds_played else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'sim_id': self.sim_id,
+            'agent_id': self.agent_id,
+            'strategy': self.strategy,
+            'wins': self.wins,
+            'losses': self.losses,
+            'pushes': self.pushes,
+            'rounds_played': self.rounds_played,
+            'total_profit': self.total_profit,
+            'avg_profit': self.avg_profit,
+            'final_bankroll': self.final_bankroll,
+            'broke_round': self.broke_round,
+        }
+
+    def __repr__(self) -> str:
+        return (f"AgentResult(sim {self.sim_id}, agent {self.agent_id}, {self.strategy}: "
+                f"profit {self.total_profit} over {self.rounds_played} rounds, bankroll {self.final_bankroll})")
+
+
+class SimulationResult:
+    """Every agent's result, in sim then seat order, plus the seed used and the run time."""
+
+    def __init__(self, config: SimulationConfig, seed: int) -> None:
+        self.config = config
+        self.seed = seed
+        self.agents: List[AgentResult] = []
+        self.records: List[Record] = []
+        self.seconds = 0.0
+
+    def by_strategy(self) -> Dict[str, List[AgentResult]]:
+        groups: Dict[str, List[AgentResult]] = {}
+        for result in self.agents:
+            groups.setdefault(result.strategy, []).append(result)
+        return groups
+
+    def aggregate(self) -> ResultsAggregator:
+        """The records folded into a ResultsAggregator, for quantiles and the analyze_games reports."""
+        aggregator = ResultsAggregator()
+        aggregator.write(self.records)
+        return aggregator
+
+    def summary(self) -> Dict[str, dict]:
+        """Per strategy: agents, mean profit per round with its 95% half-width, mean final bankroll, broke share."""
+        summary = {}
+        for strategy, results in self.by_strategy().items():
+            count = len(results)
+            mean = sum(result.avg_profit for result in results) / count
+            variance = (sum((result.avg_profit - mean) ** 2 for result in results) / (count - 1)
+                        if count > 1 else math.inf)
+            summary[strategy] = {
+                'agents': count,
+                'mean_profit_per_round': mean,
+                'ci95': Z_95 * math.sqrt(variance / count),
+                'mean_final_bankroll': sum(result.final_bankroll for result in results) / count,
+                'broke': sum(result.broke_round is not None for result in results) / count,
+            }
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            'config': self.config.to_dict(),
+            'seed': self.seed,
+            'seconds': self.seconds,
+            'agents': [result.to_dict() for result in self.agents],
+        }
+
+
+def simulate(config: SimulationConfig, sink: Optional[ResultSink] = None) -> SimulationResult:
+    """Plays config's sims without console output; records also go to sink if given (flushed, not closed)."""
+    seed = config.seed if config.seed is not None else random.randrange(2 ** 32)
+    result = SimulationResult(config, seed)
+    start = time.perf_counter()
+    for sim_id in range(config.sims):
+        agents = config.agents()
+        # Agent IDs follow sim_id, as in game.run_one_sim
+        for offset, agent in enumerate(agents):
+            agent.id = sim_id * len(agents) + offset + 1
+        env = BlackjackEnvironment(config.num_decks, rng=sim_rng(seed, sim_id, config.rng),
+                                   penetration=config.penetration, continuous=config.continuous)
+        game = BlackjackGame(env, agents, verbose=False, rules=config.rules)
+        game.run_simulation(config.rounds, sim_id)
+        records = game.result_records(config.rounds, sim_id)
+        result.records.extend(records)
+        # In seat order: the game moves agents that go broke to the end of its lists
+        result.agents.extend(AgentResult(sim_id, agent) for agent in agents)
+        if sink is not None:
+            sink.write(records)
+    if sink is not None:
+        sink.flush()
+    result.seconds = time.perf_counter() - start
+    return result
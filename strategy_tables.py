@@ -0,0 +1,175 @@
+"""
+Strategy tables for any TableRules, generated by the exact EV engine.
+
+generate_tables solves every cell of the basic strategy table (the rows of
+utils.HAND_KEYS against each upcard) with ev.evaluate_table, each row at
+the hand its key names (hard 8 and 17 and A,8 stand in for the hands
+below, above and beside them that share their row): the basic
+action from a full shoe, and the Hi-Lo count deviations from shoes built to
+each true count in TRUE_COUNTS. A doubling or surrender cell falls back to
+whichever of hit and stand scores better (DH/DS, Rh/Rs). Each cell gets at
+most one deviation: the true count nearest 0 where the best action differs
+from basic, and the counts beyond it with that same action, open-ended if
+it lasts to the end of the grid.
+
+strategy_tables(rules) pays the generation cost (minutes) once per rule
+set: tables are kept on disk as <rules.key()>.v<SOLVER_VERSION>.json under
+STRATEGY_CACHE_DIR, which the BLACKJACK_STRATEGY_CACHE environment variable
+overrides. The game's own rules keep the hand-written tables in utils.py at
+any deck count, so default games play exactly as before.
+
+    python strategy_tables.py --decks 6 --h17 --payout 1.2 --surrender
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from environment import Card
+from rules import TableRules
+from utils import DEFAULT_TABLES, HAND_KEYS, Action, StrategyTables
+
+# Bump when the solver's output changes, so stale cached tables are regenerated
+SOLVER_VERSION = 2
+STRATEGY_CACHE_DIR = "strategy_cache"
+# True counts the deviations are solved at
+TRUE_COUNTS = tuple(range(-5, 9))
+# Ranks taken out, in turn, to raise or lower the Hi-Lo running count
+LOW_RANKS = (2, 3, 4, 5, 6)
+HIGH_RANKS = (10, 10, 10, 10, 1)
+
+# Rules -> tables already loaded in this process
+_loaded: Dict[TableRules, StrategyTables] = {}
+
+
+def cache_dir() -> str:
+    return os.environ.get("BLACKJACK_STRATEGY_CACHE", STRATEGY_CACHE_DIR)
+
+
+def cache_path(rules: TableRules) -> str:
+    return os.path.join(cache_dir(), f"{rules.key()}.v{SOLVER_VERSION}.json")
+
+
+def composition_at_true_count(num_decks: int, true_count: float) -> Tuple[int, ...]:
+    """
+    A half-dealt shoe (ev.py composition) with the given Hi-Lo true count:
+    the even share of every rank, less low cards for a positive count or
+    tens and aces (four tens to an ace) for a negative one.
+    """
+    counts = [2 * num_decks] * 9 + [8 * num_decks]
+    running_count = round(true_count * num_decks / 2)
+    ranks = LOW_RANKS if running_count > 0 else HIGH_RANKS
+    for i in range(abs(running_count)):
+        rank = ranks[i % len(ranks)]
+        if not counts[rank - 1]:
+            raise ValueError(f"True count {true_count} is out of reach with {num_decks} decks")
+        counts[rank - 1] -= 1
+    return tuple(counts)
+
+
+def solve_actions(rules: TableRules, comp: Optional[Tuple[int, ...]] = None) -> List[Action]:
+    """The best table action of every cell, in StrategyTables order, against comp (default: a full shoe)."""
+    import ev
+    report = ev.evaluate_table(rules, comp, named=True)
+    # Each composition shares next to no subproblems with the next
+    ev.clear_caches()
+    return [ev.table_action(report[(hand_key, dealer_key)]['evs'])
+            for hand_key in HAND_KEYS for dealer_key in Card.DEALER_KEYS]
+
+
+def _deviation(basic: Action, actions: Sequence[Action]) -> Tuple[float, float, Action]:
+    """Compiled (min, max, action) of a cell's deviation, given its action at each of TRUE_COUNTS."""
+    differing = [i for i, action in enumerate(actions) if action != basic]
+    if not differing:
+        return float('inf'), float('inf'), Action.STAND
+    # Nearest 0 first, the positive side on a tie
+    start = min(differing, key=lambda i: (abs(TRUE_COUNTS[i]), TRUE_COUNTS[i] < 0))
+    step = 1 if TRUE_COUNTS[start] >= 0 else -1
+    end = start
+    while 0 <= end + step < len(actions) and actions[end + step] == actions[start]:
+        end += step
+    low, high = sorted((start, end))
+    return (float('-inf') if step < 0 and low == 0 else TRUE_COUNTS[low],
+            float('inf') if step > 0 and high == len(actions) - 1 else TRUE_COUNTS[high],
+            actions[start])
+
+
+def generate_tables(rules: TableRules, workers: Optional[int] = None) -> StrategyTables:
+    """Solves basic strategy and its deviations for rules, one composition per task on workers processes."""
+    comps = [None] + [composition_at_true_count(rules.num_decks, tc) for tc in TRUE_COUNTS]
+    if workers == 1:
+        solved = [solve_actions(rules, comp) for comp in comps]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            solved = list(pool.map(solve_actions, [rules] * len(comps), comps))
+    basic, by_count = solved[0], solved[1:]
+    deviations = [_deviation(action, [actions[cell] for actions in by_count]) for cell, action in enumerate(basic)]
+    dev_min, dev_max, dev_action = zip(*deviations)
+    return StrategyTables(tuple(basic), dev_min, dev_max, dev_action)
+
+
+def strategy_tables(rules: TableRules, workers: Optional[int] = None) -> StrategyTables:
+    """Tables for rules: the hand-written ones for the game's own rules, else cached or generated and saved."""
+    if rules == TableRules(num_decks=rules.num_decks):
+        return DEFAULT_TABLES
+    if rules in _loaded:
+        return _loaded[rules]
+    path = cache_path(rules)
+    if os.path.exists(path):
+        with open(path) as f:
+            tables = StrategyTables.from_dict(json.load(f)['tables'])
+    else:
+        tables = generate_tables(rules, workers)
+        os.makedirs(cache_dir(), exist_ok=True)
+        # Written whole and then renamed, so concurrent readers never see a partial file
+        partial = f"{path}.{os.getpid()}.tmp"
+        with open(partial, "w") as f:
+            json.dump({'rules': rules.to_dict(), 'solver_version': SOLVER_VERSION, 'tables': tables.to_dict()}, f)
+        os.replace(partial, path)
+    _loaded[rules] = tables
+    return tables
+
+
+def format_tables(tables: StrategyTables) -> str:
+    """The basic strategy grid, with each cell's deviation (if any) listed below it."""
+    width = 4
+    lines = ["     " + "".join(f"{key:>{width}}" for key in Card.DEALER_KEYS)]
+    for row, hand_key in enumerate(HAND_KEYS):
+        cells = tables.basic[row * 10:row * 10 + 10]
+        lines.append(f"{hand_key!s:>4} " + "".join(f"{_short(action):>{width}}" for action in cells))
+    for cell in range(len(tables.basic)):
+        deviation = tables.deviation(cell)
+        if deviation is not None:
+            min_tc, max_tc, action = deviation
+            hand_key, dealer_key = HAND_KEYS[cell // 10], Card.DEALER_KEYS[cell % 10]
+            bounds = (f"{min_tc:g} and up" if max_tc is None else f"{max_tc:g} and down" if min_tc is None
+                      else f"{min_tc:g}" if min_tc == max_tc else f"{min_tc:g} to {max_tc:g}")
+            lines.append(f"{hand_key} vs {dealer_key}: {action.value} at true counts {bounds}")
+    return "\n".join(lines)
+
+
+def _short(action: Action) -> str:
+    return {Action.HIT: "H", Action.STAND: "S", Action.DOUBLE_HIT: "Dh", Action.DOUBLE_STAND: "Ds",
+            Action.SPLIT: "P", Action.SURRENDER_HIT: "Rh", Action.SURRENDER_STAND: "Rs"}.get(action, "?")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate (or load) the strategy tables for a rule set")
+    parser.add_argument("--decks", type=int, default=4)
+    parser.add_argument("--h17", action="store_true", help="dealer hits soft 17")
+    parser.add_argument("--payout", type=float, default=1.5, help="blackjack payout, e.g. 1.2 for 6:5")
+    parser.add_argument("--no-das", action="store_true", help="no doubling after a split")
+    parser.add_argument("--max-split-hands", type=int, help="hands a player may split to")
+    parser.add_argument("--surrender", action="store_true")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+    rules = TableRules(args.decks, args.h17, args.payout, not args.no_das, args.max_split_hands, args.surrender)
+    print(rules)
+    print(format_tables(strategy_tables(rules, args.workers)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
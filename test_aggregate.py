@@ -0,0 +1,25 @@
+"""Checks on the streaming aggregates that don't depend on a simulation run."""
+from aggregate import PairedComparison
+from results import COLUMN_NAMES
+
+
+def record(sim_id, strategy, avg_profit):
+    values = dict.fromkeys(COLUMN_NAMES, 0)
+    values.update(sim_id=sim_id, strategy=strategy, avg_profit=avg_profit)
+    return tuple(values[name] for name in COLUMN_NAMES)
+
+
+def test_paired_comparison_ignores_record_order():
+    profits = {0: {'unskilled': -2.0, 'basic': -0.5, 'counting': 0.5},
+               1: {'unskilled': -1.0, 'basic': 0.0, 'counting': 0.25}}
+    in_order, reversed_order = PairedComparison(), PairedComparison()
+    for sim_id, by_strategy in profits.items():
+        records = [record(sim_id, strategy, profit) for strategy, profit in by_strategy.items()]
+        in_order.write(records)
+        # As when unskilled goes broke and is written last, or a sim's rows are shuffled
+        reversed_order.write(records[::-1])
+    expected = in_order.summary()
+    assert [row['Comparison'] for row in expected] == ['basic - unskilled', 'counting - unskilled',
+                                                      'counting - basic']
+    assert reversed_order.summary() == expected
+    assert expected[2]['Mean_Difference_Per_Round'] == 0.625
@@ -0,0 +1,152 @@
+"""
+Pins the fast paths to the code they replaced.
+
+The strategy reference below is the original string-keyed lookup into
+BASIC_STRATEGY / DEVIATIONS, kept here so utils.recommend_action can be
+checked decision for decision against it. The lazily shuffled shoe is
+checked against random.shuffle of a freshly built one, and the batch
+engine against the Python engine playing the same shoes.
+"""
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from agent import BlackjackAgent
+from batch_sim import BatchSimulator
+from environment import BlackjackEnvironment, Card
+from game import BlackjackGame
+from results import format_csv_row
+from utils import BASIC_STRATEGY, DEVIATIONS, Action, recommend_action
+
+FACES = range(1, 14)
+# Every deviation bound, exactly and just either side, plus a grid around them
+TRUE_COUNTS = sorted({x / 2 for x in range(-16, 17)} |
+                     {bound + eps for low, high, _ in DEVIATIONS.values() for bound in (low, high)
+                      if bound is not None for eps in (-1e-9, 0, 1e-9)})
+
+
+def reference_value(faces):
+    total = sum(11 if face == 1 else min(face, 10) for face in faces)
+    aces = faces.count(1)
+    while total > 21 and aces:
+        total -= 10
+        aces -= 1
+    return total
+
+
+def reference_key(faces, dealer_face, allow_split):
+    dealer_key = 'A' if dealer_face == 1 else str(min(dealer_face, 10))
+    if len(faces) == 2 and faces[0] == faces[1] and allow_split:
+        face = faces[0]
+        face = 'A' if face == 1 else 'T' if face >= 10 else str(face)
+        return (f"{face}{face}", dealer_key)
+    if 1 in faces and len(faces) == 2:
+        other = faces[1] if faces[0] == 1 else faces[0]
+        return (f"A{min(min(other, 10), 8)}", dealer_key)
+    return (max(8, min(reference_value(faces), 17)), dealer_key)
+
+
+def reference_action(faces, dealer_face, true_count, strategy, allow_split):
+    if strategy == 'unskilled':
+        if allow_split and len(faces) == 2 and faces[0] == faces[1] and faces[0] in (1, 8):
+            return Action.SPLIT
+        return Action.HIT if reference_value(faces) < 17 else Action.STAND
+    key = reference_key(faces, dealer_face, allow_split)
+    if strategy == 'counting' and key in DEVIATIONS:
+        min_tc, max_tc, action = DEVIATIONS[key]
+        if min_tc == 0 or max_tc == 0:
+            # A zero bound is exclusive
+            if (min_tc is None or true_count > min_tc) and (max_tc is None or true_count < max_tc):
+                return Action(action)
+        if (min_tc is None or true_count >= min_tc) and (max_tc is None or true_count <= max_tc):
+            return Action(action)
+    return Action(BASIC_STRATEGY.get(key, 'stand'))
+
+
+def hands():
+    """Every two-card hand by face, and every three-card hand still in play (J/Q/K as 10)."""
+    yield from itertools.product(FACES, repeat=2)
+    yield from (faces for faces in itertools.product(range(1, 11), repeat=3) if reference_value(faces) < 21)
+
+
+@pytest.mark.parametrize("strategy, allow_split", [
+    ('unskilled', True), ('unskilled', False), ('basic', True), ('basic', False),
+    ('counting', True), ('counting', False),
+])
+def test_recommend_action_matches_dict_lookup(strategy, allow_split):
+    true_counts = TRUE_COUNTS if strategy == 'counting' else (0,)
+    mismatches = []
+    for faces in hands():
+        if not allow_split and faces == (1, 1):
+            # The old lookup had no row for an unsplit A,A
+            continue
+        hand = [Card(suit, face) for suit, face in zip((1, 2, 3), faces)]
+        for dealer_face in FACES:
+            dealer = Card(4, dealer_face)
+            for true_count in true_counts:
+                expected = reference_action(list(faces), dealer_face, true_count, strategy, allow_split)
+                actual = recommend_action(hand, dealer, true_count, strategy, allow_split)
+                if actual != expected:
+                    mismatches.append((faces, dealer_face, true_count, expected, actual))
+    assert not mismatches, mismatches[:10]
+
+
+@pytest.mark.parametrize("num_decks, seed", [(1, 0), (4, 7), (6, 12345)])
+def test_lazy_deal_matches_random_shuffle(num_decks, seed):
+    env = BlackjackEnvironment(num_decks, rng=random.Random(seed))
+    reference = random.Random(seed)
+    # Dealing a whole shoe draws as much as shuffling it, so the next shoe matches too
+    for _ in range(2):
+        # The shoe as first built, shuffled eagerly and dealt from the end
+        deck = [(suit, face) for _ in range(num_decks) for suit in range(1, 5) for face in FACES]
+        reference.shuffle(deck)
+        dealt = [env.deal() for _ in deck]
+        assert [(card.suit, card.face) for card in dealt] == deck[::-1]
+        env.reset()
+
+
+class RecordingSimulator(BatchSimulator):
+    """BatchSimulator that keeps every shoe each table was dealt, in order."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.table_shoes = [[row.copy()] for row in self.shoe.reshape(self.num_tables, self.shoe_size)]
+
+    def reshuffle(self, idx: np.ndarray) -> None:
+        super().reshuffle(idx)
+        for table in idx:
+            self.table_shoes[table].append(self.shoe.reshape(self.num_tables, self.shoe_size)[table].copy())
+
+
+class RecordedShoes:
+    """Hands an environment one table's recorded shoes, in the form ShuffledShoes.next gives."""
+
+    def __init__(self, shoes) -> None:
+        self.shoes = list(shoes)
+
+    def next(self) -> bytes:
+        # The batch deals a row from the front, the environment from the end; suits don't matter
+        return bytes(int(face) - 1 for face in self.shoes.pop(0)[::-1])
+
+
+@pytest.mark.parametrize("bankroll, rounds", [(10000, 200), (1000, 400), (60, 400)])
+def test_batch_engine_matches_python_engine(bankroll, rounds):
+    strategies = ('unskilled', 'basic', 'counting')
+    batch = RecordingSimulator(64, strategies, bankroll=bankroll, base_bet=30, rng=np.random.default_rng(bankroll))
+    batch.run(rounds)
+    # Rows without the agent id, which each engine numbers its own way
+    expected = [format_csv_row(record[:2] + (0,) + record[3:]) for record in batch.result_records(rounds)]
+
+    actual = []
+    for sim_id, shoes in enumerate(batch.table_shoes):
+        env = BlackjackEnvironment(batch.num_decks, rng=random.Random(0))
+        env.shuffled_shoes, env.randbelow = RecordedShoes(shoes), None
+        env.reset()
+        agents = [BlackjackAgent(bankroll, 30, strategy=strategy, history='off') for strategy in strategies]
+        game = BlackjackGame(env, agents)
+        game.set_verbose(False)
+        game.run_simulation(rounds, sim_id)
+        actual += [format_csv_row(record[:2] + (0,) + record[3:]) for record in game.result_records(rounds, sim_id)]
+    assert actual == expected
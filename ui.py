@@ -1,6 +1,6 @@
 from typing import List
 from environment import Card
-from utils import Action, hand_value, recommend_action
+from utils import DEFAULT_TABLES, Action, Hand, StrategyTables, recommend_action
 
 
 # A bit of an experiment
@@ -17,10 +17,13 @@ class ConsoleUI:
                 print("Please enter a valid number")
 
     @staticmethod
-    def prompt_action(valid_actions: List[Action], hand: List[Card], dealer_upcard: Card) -> Action:
-        suggested = recommend_action(hand, dealer_upcard)
+    def prompt_action(valid_actions: List[Action], hand: Hand, dealer_upcard: Card,
+                      tables: StrategyTables = DEFAULT_TABLES) -> Action:
+        suggested = recommend_action(hand, dealer_upcard, tables=tables)
         if suggested in [Action.DOUBLE_HIT, Action.DOUBLE_STAND]:
             suggested = Action.DOUBLE
+        elif suggested in [Action.SURRENDER_HIT, Action.SURRENDER_STAND]:
+            suggested = Action.SURRENDER
         print(f"Suggested Move: {suggested.value}")
         while True:
             action_str = input(f"Action ({'/'.join(a.value for a in valid_actions)}): ").lower()
@@ -33,8 +36,8 @@ class ConsoleUI:
                 print("Invalid action! Please choose a valid option.")
 
     @staticmethod
-    def display_hand(hand: List[Card], title: str) -> None:
-        print(f"{title}: {hand} (Value: {hand_value(hand)})")
+    def display_hand(hand: Hand, title: str) -> None:
+        print(f"{title}: {hand} (Value: {hand.total})")
 
     @staticmethod
     def show_dealer_upcard(card: Card) -> None:
@@ -45,12 +48,14 @@ class ConsoleUI:
         print(f"Dealer {action}: {card} (Total: {total})")
 
     @staticmethod
-    def show_round_result(agent_id: int, results: List[float], bets: List[int], bankroll: float) -> None:
+    def show_round_result(agent_id: int, results: List[float], hands: List[Hand], bankroll: float) -> None:
         print(f"\nPlayer {agent_id} Results:")
         for i, result in enumerate(results):
-            bet = bets[i]
+            bet = hands[i].bet
             payout = bet * result
-            if result == 1.5:
+            if hands[i].surrendered:
+                print(f"Hand {i+1}: Surrender! Lost: ${-payout}")
+            elif hands[i].is_blackjack and result > 0:
                 print(f"Hand {i+1}: Blackjack! Bet: ${bet} -> Payout: ${payout}")
             elif result == 1:
                 print(f"Hand {i+1}: Win! Bet: ${bet} -> Payout: ${payout}")
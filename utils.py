@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterable, List, Optional
 from environment import Card
 from enum import Enum
 
@@ -15,6 +15,9 @@ class Action(str, Enum):
     DOUBLE_STAND = "double_stand" # Ds = "Double if possible, otherwise Stand"
     DOUBLE = "double"
     SPLIT = "split"
+    SURRENDER = "surrender"
+    SURRENDER_HIT = "surrender_hit"     # Rh = "Surrender if allowed, otherwise Hit"
+    SURRENDER_STAND = "surrender_stand" # Rs = "Surrender if allowed, otherwise Stand"
 
     def __repr__(self):
         return self.value
@@ -181,13 +184,79 @@ def get_deviation_action(hand_key, true_count):
     return None
 
 
+class Hand:
+    """
+    Cards of one hand plus its wager. The hard total (aces as 1) and ace count
+    are kept up to date as cards are added, so the score is O(1).
+    """
+    __slots__ = ('cards', 'hard', 'aces', 'bet', 'doubled', 'surrendered')
+
+    def __init__(self, cards: Iterable[Card] = (), bet: int = 0) -> None:
+        self.cards: List[Card] = []
+        self.hard: int = 0
+        self.aces: int = 0
+        self.bet: int = bet
+        self.doubled: bool = False
+        self.surrendered: bool = False
+        for card in cards:
+            self.append(card)
+
+    def append(self, card: Card) -> None:
+        self.cards.append(card)
+        self.hard += card.points - 10 if card.ace else card.points
+        self.aces += card.ace
+
+    def pop(self) -> Card:
+        card = self.cards.pop()
+        self.hard -= card.points - 10 if card.ace else card.points
+        self.aces -= card.ace
+        return card
+
+    @property
+    def total(self) -> int:
+        # At most one ace can count as 11 without busting
+        if self.aces and self.hard <= 11:
+            return self.hard + 10
+        return self.hard
+
+    @property
+    def is_soft(self) -> bool:
+        return self.aces > 0 and self.hard <= 11
+
+    @property
+    def is_blackjack(self) -> bool:
+        return len(self.cards) == 2 and self.total == 21
+
+    @property
+    def is_bust(self) -> bool:
+        return self.hard > 21
+
+    @property
+    def is_pair(self) -> bool:
+        return len(self.cards) == 2 and self.cards[0] == self.cards[1]
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __getitem__(self, index):
+        return self.cards[index]
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def __repr__(self):
+        return repr(self.cards)
+
+
 def hand_value(hand: List[Card]) -> int:
+    if isinstance(hand, Hand):
+        return hand.total
     total: int = 0
     aces: int = 0 # keeps track of the number of aces
     for c in hand:
-        if c.is_ace():
+        if c.ace:
             aces += 1 # increment the number of aces in the hand, not the actual total count
-        total += c.value() # 11 for ace by default
+        total += c.points # 11 for ace by default
     while total > 21 and aces > 0:
         # calculating soft total if hard total is > 21
         total -= 10 # reduce by 10 because 11 - 1 is 10
@@ -195,63 +264,126 @@ def hand_value(hand: List[Card]) -> int:
     return total
 
 
+# Compiled strategy tables: one flat list per table, indexed by
+# hand class * 10 + dealer column (Card.dealer_index: 2..9, 10, A => 0..9)
+ACTIONS = (Action.HIT, Action.STAND, Action.DOUBLE_HIT, Action.DOUBLE_STAND, Action.SPLIT)
+# Hand classes: 0..9 hard 8..17, 10..16 soft A2..A8, 17..26 pairs 22..99, TT, AA
+HAND_KEYS = ([total for total in range(8, 18)] +
+             [f"A{v}" for v in range(2, 9)] +
+             [f"{f}{f}" for f in '23456789TA'])
+SOFT_BASE = 10
+PAIR_BASE = 17
+
+
+class StrategyTables:
+    """
+    A basic strategy and its count deviations, compiled to flat lists
+    indexed by hand class * 10 + dealer column. A deviation applies iff
+    min <= true count <= max, as in get_deviation_action.
+    """
+
+    def __init__(self, basic: tuple, dev_min: tuple, dev_max: tuple, dev_action: tuple) -> None:
+        self.basic = basic
+        self.dev_min = dev_min
+        self.dev_max = dev_max
+        self.dev_action = dev_action
+
+    @classmethod
+    def compile(cls, basic_strategy: dict, deviations: dict) -> "StrategyTables":
+        """From dicts shaped like BASIC_STRATEGY and DEVIATIONS."""
+        basic, dev_min, dev_max, dev_action = [], [], [], []
+        for hand_key in HAND_KEYS:
+            for dealer_key in Card.DEALER_KEYS:
+                key = (hand_key, dealer_key)
+                basic.append(Action(basic_strategy.get(key, 'stand')))
+                min_tc, max_tc, action = deviations.get(key, (float('inf'), float('inf'), 'stand'))
+                dev_min.append(float('-inf') if min_tc is None else min_tc)
+                dev_max.append(float('inf') if max_tc is None else max_tc)
+                dev_action.append(Action(action))
+        return cls(tuple(basic), tuple(dev_min), tuple(dev_max), tuple(dev_action))
+
+    def deviation(self, cell: int) -> Optional[tuple]:
+        """(min, max, action) of the cell's deviation, None for an open bound; None if it has none."""
+        if self.dev_min[cell] == float('inf'):
+            return None
+        return (None if self.dev_min[cell] == float('-inf') else self.dev_min[cell],
+                None if self.dev_max[cell] == float('inf') else self.dev_max[cell],
+                self.dev_action[cell])
+
+    def to_dict(self) -> dict:
+        deviations = []
+        for cell in range(len(self.basic)):
+            deviation = self.deviation(cell)
+            deviations.append(None if deviation is None else [*deviation[:2], deviation[2].value])
+        return {'basic': [action.value for action in self.basic], 'deviations': deviations}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "StrategyTables":
+        dev_min, dev_max, dev_action = [], [], []
+        for deviation in state['deviations']:
+            min_tc, max_tc, action = deviation if deviation is not None else (float('inf'), float('inf'), 'stand')
+            dev_min.append(float('-inf') if min_tc is None else min_tc)
+            dev_max.append(float('inf') if max_tc is None else max_tc)
+            dev_action.append(Action(action))
+        return cls(tuple(Action(action) for action in state['basic']), tuple(dev_min), tuple(dev_max),
+                   tuple(dev_action))
+
+
+def _unskilled_table():
+    # Unskilled play ignores the dealer: split 8s and aces, otherwise hit below 17
+    class_totals = list(range(8, 18)) + [11 + v for v in range(2, 9)] + [2 * v for v in range(2, 11)] + [12]
+    unskilled = [Action.HIT if total < 17 else Action.STAND for total in class_totals]
+    unskilled[PAIR_BASE + 6] = Action.SPLIT  # 88
+    unskilled[PAIR_BASE + 9] = Action.SPLIT  # AA
+    return tuple(unskilled)
+
+
+# The hand-written tables above, for the default rules (rules.DEFAULT_RULES)
+DEFAULT_TABLES = StrategyTables.compile(BASIC_STRATEGY, DEVIATIONS)
+BASIC_TABLE, DEVIATION_MIN, DEVIATION_MAX, DEVIATION_ACTION = (
+    DEFAULT_TABLES.basic, DEFAULT_TABLES.dev_min, DEFAULT_TABLES.dev_max, DEFAULT_TABLES.dev_action)
+UNSKILLED_TABLE = _unskilled_table()
+
+
+def hand_class(player_hand: List[Card], allow_split=True) -> int:
+    """Row of the compiled tables for a hand, matching the BASIC_STRATEGY key."""
+    if len(player_hand) == 2:
+        first, second = player_hand
+        if allow_split and first.face == second.face:
+            return PAIR_BASE + first.dealer_index
+        if first.ace or second.ace:
+            other = second if first.ace else first
+            # A,A with splitting disallowed is a soft 12, played on the lowest soft row (A2)
+            return SOFT_BASE + (0 if other.ace else min(other.points, 8) - 2)
+    return max(8, min(hand_value(player_hand), 17)) - 8
+
+
 # Unskilled strategy
-def unskilled_strategy(player_hand: List[Card]) -> Action:
-    total = hand_value(player_hand)
-    if len(player_hand) == 2 and player_hand[0] == player_hand[1]:
-        face = player_hand[0].get_face()
-        if face in ['8', 'A']:
-            return Action.SPLIT
-    return Action.HIT if total < 17 else Action.STAND
+def unskilled_strategy(player_hand: List[Card], allow_split=True) -> Action:
+    return UNSKILLED_TABLE[hand_class(player_hand, allow_split)]
 
 
 # Basic strategy
-def basic_strategy(player_hand: List[Card], dealer_card: Card, allow_split=True) -> Action:
-    total = hand_value(player_hand)
-    dealer_val = dealer_card.get_face()
-    if dealer_val in ['10', 'J', 'Q', 'K']:
-        dealer_val = '10'
-
-    if len(player_hand) == 2 and player_hand[0] == player_hand[1] and allow_split:
-        face = player_hand[0].get_face()
-        face = 'T' if face in ['10', 'J', 'Q', 'K'] else face
-        hand_key = (f"{face}{face}", dealer_val)
-    elif any(c.is_ace() for c in player_hand) and len(player_hand) == 2:
-        non_ace_card = next(c for c in player_hand if not c.is_ace())
-        face = str(min(non_ace_card.value(), 8))
-        hand_key = (f"A{face}", dealer_val)
-    else:
-        hand_key = (max(8, min(total, 17)), dealer_val)
-
-    return Action(BASIC_STRATEGY.get(hand_key, 'stand'))
+def basic_strategy(player_hand: List[Card], dealer_card: Card, allow_split=True,
+                   tables: StrategyTables = DEFAULT_TABLES) -> Action:
+    return tables.basic[hand_class(player_hand, allow_split) * 10 + dealer_card.dealer_index]
 
 
 # Counting strategy (builds upon basic strategy)
-def counting_strategy(player_hand: List[Card], dealer_card: Card, true_count: float) -> Action:
-    total = hand_value(player_hand)
-    dealer_val = dealer_card.get_face()
-    if dealer_val in ['10', 'J', 'Q', 'K']:
-        dealer_val = '10'
-
-    if len(player_hand) == 2 and player_hand[0] == player_hand[1]:
-        face = player_hand[0].get_face()
-        face = 'T' if face in ['10', 'J', 'Q', 'K'] else face
-        hand_key = (f"{face}{face}", dealer_val)
-    elif any(c.is_ace() for c in player_hand) and len(player_hand) == 2:
-        non_ace_card = next(c for c in player_hand if not c.is_ace())
-        face = str(min(non_ace_card.value(), 8))
-        hand_key = (f"A{face}", dealer_val)
-    else:
-        hand_key = (max(8, min(total, 17)), dealer_val)
-
-    deviation_action = get_deviation_action(hand_key, true_count)
-    return Action(deviation_action) if deviation_action else basic_strategy(player_hand, dealer_card)
+def counting_strategy(player_hand: List[Card], dealer_card: Card, true_count: float, allow_split=True,
+                      tables: StrategyTables = DEFAULT_TABLES) -> Action:
+    cell = hand_class(player_hand, allow_split) * 10 + dealer_card.dealer_index
+    if tables.dev_min[cell] <= true_count <= tables.dev_max[cell]:
+        return tables.dev_action[cell]
+    return tables.basic[cell]
 
 # General function to recommend an action
-def recommend_action(player_hand: List[Card], dealer_card: Card, true_count: float = 0, strategy: str = 'basic', allow_split=True) -> Action:
+def recommend_action(player_hand: List[Card], dealer_card: Card, true_count: float = 0, strategy: str = 'basic', allow_split=True,
+                     tables: StrategyTables = DEFAULT_TABLES) -> Action:
+    """The strategy's action; tables are the basic strategy and deviations for the table's rules."""
     if strategy == 'unskilled':
-        return unskilled_strategy(player_hand)
+        return unskilled_strategy(player_hand, allow_split)
     elif strategy == 'counting':
-        return counting_strategy(player_hand, dealer_card, true_count)
+        return counting_strategy(player_hand, dealer_card, true_count, allow_split, tables)
     else:
-        return basic_strategy(player_hand, dealer_card, allow_split=allow_split)
\ No newline at end of file
+        return basic_strategy(player_hand, dealer_card, allow_split=allow_split, tables=tables)
\ No newline at end of file
@@ -0,0 +1,276 @@
+"""
+Vectorized step API for training learning agents.
+
+VecBlackjackEnv keeps N independent one-seat tables as NumPy arrays, laid
+out like batch_sim.BatchSimulator (face-code shoes with Hi-Lo prefix
+counts, hand codes), but leaves every decision to the caller:
+
+    env = VecBlackjackEnv(1024, rng=np.random.default_rng(1))
+    obs, info = env.reset()
+    for _ in range(steps):
+        actions = policy(obs)  # an ACTIONS code per table, legal by obs['legal']
+        obs, reward, terminated, truncated, info = env.step(actions)
+
+Each round is one episode, played for a unit bet. A step plays one action
+on every table's current hand. A table whose round it ends gets the
+round's reward (each hand's resolve_bets result times its bet, -0.5 for a
+surrender) and is dealt its next round in the same step, so obs always
+asks for a decision. An opening blackjack still takes one step, with only
+STAND legal; any other hand reaching 21 stands by itself, as in
+BlackjackAgent.play_turn.
+
+Observations are a dict of arrays with one entry per table: the current
+hand's 'total', its 'soft' and 'pair' (two cards of one face) flags, the
+dealer's 'upcard' (2..11, ace as 11), the Hi-Lo 'true_count' as
+BlackjackEnvironment reports it (hole card unseen), and the 'legal'
+action mask, shaped (N, len(ACTIONS)). There is no bankroll, so doubling
+and splitting are always affordable.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from batch_sim import (CODE_HIT, CODE_OUTCOME, CODE_PAIR, CODE_TOTAL, HARD_VALUE, HI_LO, NUM_CODES, RESULT_TABLE,
+                       TWO_CARD_BASE, count_prefix, shuffled_shoes, two_card_code)
+from rules import TableRules
+from utils import Action
+
+# Action codes: positions in ACTIONS
+STAND, HIT, DOUBLE, SPLIT, SURRENDER = range(5)
+ACTIONS = (Action.STAND, Action.HIT, Action.DOUBLE, Action.SPLIT, Action.SURRENDER)
+
+# Upcard as observed, by face code (ace as 11)
+UPCARD_VALUE = np.where(HARD_VALUE == 1, 11, HARD_VALUE)
+
+Observation = Dict[str, np.ndarray]
+
+
+def _soft_codes() -> np.ndarray:
+    """Whether each batch_sim hand code is soft (an ace counting 11)."""
+    soft = np.zeros(NUM_CODES, dtype=bool)
+    for code in range(NUM_CODES):
+        if code < TWO_CARD_BASE:
+            hard, has_ace = code // 2, code % 2
+        else:
+            first, second = divmod(code - TWO_CARD_BASE, 14)
+            hard, has_ace = int(HARD_VALUE[first] + HARD_VALUE[second]), first == 1 or second == 1
+        soft[code] = has_ace and hard <= 11
+    return soft
+
+
+CODE_SOFT = _soft_codes()
+
+
+class VecBlackjackEnv:
+    """
+    num_tables one-seat tables playing by rules (default: the game's own for
+    num_decks), each reshuffling at the start of a round once fewer than
+    its cut card's cards are left (52, or those left at penetration; never
+    fewer than the opening four), and whenever it runs dry mid-round.
+
+    Per-hand arrays are laid out (hand slot, table), as in BatchSimulator.
+    """
+
+    def __init__(self, num_tables: int, num_decks: Optional[int] = None, rules: Optional[TableRules] = None,
+                 penetration: Optional[float] = None, rng: Optional[np.random.Generator] = None) -> None:
+        if num_tables < 1:
+            raise ValueError(f"Need at least one table, not {num_tables}")
+        if rules is None:
+            rules = TableRules(num_decks=num_decks if num_decks is not None else 4)
+        elif num_decks is not None and num_decks != rules.num_decks:
+            raise ValueError(f"num_decks is {num_decks}, but the rules are for {rules.num_decks} decks")
+        self.num_tables = num_tables
+        self.rules = rules
+        self.num_decks = rules.num_decks
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        N = num_tables
+        self.tables = np.arange(N)
+        self.base_shoe = np.tile(np.arange(1, 14, dtype=np.int8), 4 * self.num_decks)
+        self.shoe_size = self.base_shoe.size
+        if penetration is None:
+            cut_card = 52
+        elif 0 < penetration < 1:
+            cut_card = round(self.shoe_size * (1 - penetration))
+        else:
+            raise ValueError(f"Penetration must be between 0 and 1, not {penetration}")
+        self.penetration = penetration
+        self.cut_card = max(4, cut_card)
+        # All shoes live in one flat array; pos is each table's absolute deal position
+        self.shoe = np.zeros(N * self.shoe_size, dtype=np.int8)
+        self.shoe_start = self.tables * self.shoe_size
+        self.shoe_end = self.shoe_start + self.shoe_size
+        self.pos = self.shoe_end.copy()
+        # Running counts from per-shoe Hi-Lo prefix sums (row stride shoe_size + 1),
+        # less the dealer's hole card while it is face down
+        self.hi_lo_prefix = np.zeros(N * (self.shoe_size + 1), dtype=np.int16)
+        self.hidden_count = np.zeros(N, dtype=np.int64)
+
+        # At most one hand per card of the split face
+        self.max_hands = min(rules.max_split_hands or 4 * self.num_decks, 4 * self.num_decks)
+        self.codes = np.zeros((self.max_hands, N), dtype=np.int16)
+        self.doubled = np.zeros((self.max_hands, N), dtype=bool)
+        self.num_hands = np.ones(N, dtype=np.int64)
+        self.current = np.zeros(N, dtype=np.int64)  # Hand slot awaiting the next action
+        self.surrendered = np.zeros(N, dtype=bool)
+        self.hole = np.zeros(N, dtype=np.int8)
+        self.upcard = np.zeros(N, dtype=np.int8)
+        self.legal = np.zeros((N, len(ACTIONS)), dtype=bool)
+
+        # Per hand code: whether the dealer draws to it, and the result against each dealer outcome
+        self.dealer_hits = (CODE_TOTAL < 17) | (rules.dealer_hits_soft_17 & (CODE_TOTAL == 17) & CODE_SOFT)
+        self.result_table = np.where(RESULT_TABLE == 3, rules.blackjack_payout, RESULT_TABLE / 2)
+
+    def reset(self, seed: Optional[int] = None) -> Tuple[Observation, dict]:
+        """Fresh shoes and a new round on every table; seed reseeds the shuffles."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.reshuffle(self.tables)
+        self.deal(self.tables)
+        return self.observe(), {}
+
+    def step(self, actions: np.ndarray) -> Tuple[Observation, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """
+        Plays one ACTIONS code per table. Returns the next observation, each
+        table's reward (0 unless its round ended), which rounds ended
+        (terminated; those tables are already on their next round), truncated
+        (always False) and an empty info dict.
+        """
+        N = self.num_tables
+        actions = np.asarray(actions)
+        if (actions.shape != (N,) or actions.min() < 0 or actions.max() >= len(ACTIONS)
+                or not self.legal[self.tables, actions].all()):
+            raise ValueError(f"Need one legal action code per table (obs['legal']) for {N} tables")
+        codes = self.codes.reshape(-1)
+        slot = self.current * N + self.tables
+        code = codes[slot]
+
+        done = actions == STAND
+        surrender = actions == SURRENDER
+        if surrender.any():
+            self.surrendered |= surrender
+            done |= surrender
+        double = actions == DOUBLE
+        if double.any():
+            self.doubled.reshape(-1)[slot[double]] = True
+            done |= double
+        split = actions == SPLIT
+        if split.any():
+            code[split] = self.split(np.flatnonzero(split), code[split])
+        hit = (actions == HIT) | double
+        if hit.any():
+            code[hit] = CODE_HIT[code[hit] * 14 + self.draw(np.flatnonzero(hit))]
+        codes[slot] = code
+        done |= CODE_TOTAL[code] >= 21
+
+        # Move on to the next hand, past split hands dealt to 21
+        moving = np.flatnonzero(done)
+        while moving.size:
+            self.current[moving] += 1
+            moving = moving[self.current[moving] < self.num_hands[moving]]
+            moving = moving[CODE_TOTAL[codes[self.current[moving] * N + moving]] >= 21]
+
+        terminated = self.current == self.num_hands
+        reward = np.zeros(N)
+        over = np.flatnonzero(terminated)
+        if over.size:
+            reward[over] = self.finish(over)
+            self.deal(over)
+        return self.observe(), reward, terminated, np.zeros(N, dtype=bool), {}
+
+    def observe(self) -> Observation:
+        N = self.num_tables
+        code = self.codes.reshape(-1)[self.current * N + self.tables]
+        total = CODE_TOTAL[code]
+        pair = CODE_PAIR[code]
+        two_cards = code >= TWO_CARD_BASE
+        # Hands that reach 21 stand by themselves, so only an opening blackjack shows 21
+        playing = total < 21
+        first_hand = self.num_hands == 1
+        legal = self.legal
+        legal[:, STAND] = True
+        legal[:, HIT] = playing
+        legal[:, DOUBLE] = two_cards & playing & (first_hand | self.rules.double_after_split)
+        legal[:, SPLIT] = pair & (self.num_hands < self.max_hands)
+        legal[:, SURRENDER] = two_cards & playing & first_hand & self.rules.surrender
+
+        running_count = self.hi_lo_prefix[self.pos + self.tables] - self.hidden_count
+        remaining_decks = np.maximum((self.shoe_end - self.pos) / 52.0, 0.5)
+        return {
+            'total': total,
+            'soft': CODE_SOFT[code],
+            'pair': pair,
+            'upcard': UPCARD_VALUE[self.upcard],
+            'true_count': running_count / remaining_decks,
+            'legal': legal.copy(),
+        }
+
+    # ---- shoe ----
+    def reshuffle(self, idx: np.ndarray) -> None:
+        if idx.size == 0:
+            return
+        shoes = shuffled_shoes(self.rng, self.base_shoe, idx.size)
+        self.shoe.reshape(self.num_tables, self.shoe_size)[idx] = shoes
+        self.hi_lo_prefix.reshape(self.num_tables, self.shoe_size + 1)[idx] = count_prefix(shoes)
+        self.pos[idx] = self.shoe_start[idx]
+        # A hole card from the old shoe is never counted
+        self.hidden_count[idx] = 0
+
+    def draw(self, idx: np.ndarray) -> np.ndarray:
+        """The next card of each table in idx, reshuffling those that ran dry."""
+        pos = self.pos[idx]
+        dry = pos == self.shoe_end[idx]
+        if dry.any():
+            self.reshuffle(idx[dry])
+            pos = self.pos[idx]
+        self.pos[idx] = pos + 1
+        return self.shoe[pos]
+
+    # ---- rounds ----
+    def deal(self, idx: np.ndarray) -> None:
+        """Starts a round on each table in idx: hole card, upcard, then the player's two cards."""
+        self.reshuffle(idx[self.shoe_end[idx] - self.pos[idx] < self.cut_card])
+        start = self.pos[idx]
+        self.pos[idx] = start + 4
+        hole = self.shoe[start]
+        self.hole[idx] = hole
+        self.upcard[idx] = self.shoe[start + 1]
+        self.hidden_count[idx] = HI_LO[hole]
+        self.codes[0, idx] = two_card_code(self.shoe[start + 2], self.shoe[start + 3])
+        self.doubled[:, idx] = False
+        self.num_hands[idx] = 1
+        self.current[idx] = 0
+        self.surrendered[idx] = False
+
+    def split(self, idx: np.ndarray, code: np.ndarray) -> np.ndarray:
+        """Splits the current hand of each table in idx into a new slot; returns the code of the hand kept."""
+        first, second = np.divmod(code - TWO_CARD_BASE, 14)
+        new = self.num_hands[idx]
+        self.num_hands[idx] = new + 1
+        # The new hand is dealt its second card first, as in Agent.split_hand
+        new_card = self.draw(idx)
+        kept_card = self.draw(idx)
+        self.codes.reshape(-1)[new * self.num_tables + idx] = two_card_code(second, new_card)
+        return two_card_code(first, kept_card)
+
+    def finish(self, idx: np.ndarray) -> np.ndarray:
+        """Plays the dealer's hand on each table in idx and returns its round's reward."""
+        self.hidden_count[idx] = 0
+        dealer = two_card_code(self.hole[idx], self.upcard[idx])
+        draw = np.flatnonzero(self.dealer_hits[dealer])
+        while draw.size:
+            dealer[draw] = CODE_HIT[dealer[draw] * 14 + self.draw(idx[draw])]
+            draw = draw[self.dealer_hits[dealer[draw]]]
+
+        dealer_outcome = CODE_OUTCOME[dealer] // 25
+        reward = self.result_table[CODE_OUTCOME[self.codes[0, idx]] + dealer_outcome] * (1 + self.doubled[0, idx])
+        # Split rounds are rare, so later slots only visit the tables that have them
+        num_hands = self.num_hands[idx]
+        split = np.flatnonzero(num_hands > 1)
+        for h in range(1, int(num_hands.max())):
+            split = split[num_hands[split] > h]
+            tables = idx[split]
+            reward[split] += (self.result_table[CODE_OUTCOME[self.codes[h, tables]] + dealer_outcome[split]]
+                              * (1 + self.doubled[h, tables]))
+        reward[self.surrendered[idx]] = -0.5
+        return reward